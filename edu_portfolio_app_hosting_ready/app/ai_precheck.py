@@ -1,38 +1,169 @@
-import os, re, json
+import os, re, math, time, string, hashlib
+from dataclasses import dataclass
+from typing import Callable
 
-def analyze_file(path: str) -> dict:
+EXTRACTED_TEXT_MAX_CHARS = 100_000
+CHUNK_CHARS = 64 * 1024
+
+@dataclass(frozen=True)
+class Analyzer:
+    name: str
+    version: int   # bump when the output for the same bytes changes
+    func: Callable[[str, dict], int]  # fills report["type"/"stats"/"notes"/"summary"] in place, returns bytes read
+
+ANALYZERS: dict[str, Analyzer] = {}  # by lower-case extension, "" = fallback
+
+def register(*extensions: str, name: str, version: int = 1):
+    """Register an analyzer for file extensions, e.g. @register(".txt", name="text")."""
+    def decorator(func):
+        analyzer = Analyzer(name, version, func)
+        for ext in extensions:
+            ANALYZERS[ext.lower()] = analyzer
+        return func
+    return decorator
+
+def analyzer_for(name: str) -> Analyzer:
+    return ANALYZERS.get(os.path.splitext(name)[1].lower(), ANALYZERS[""])
+
+class HyperLogLog:
+    """Fixed-size distinct-count estimate (~1.6% error at p=12, 4 KB of registers)."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+        self._rest_bits = 64 - p
+
+    def add(self, item: str):
+        # a stable hash (unlike the per-process hash()) keeps estimates reproducible, since reports are memoized
+        self.add_hash(_token_hash(hashlib.blake2b(item.encode(), digest_size=8)))
+
+    def add_hash(self, h: int):
+        h &= 0xFFFFFFFFFFFFFFFF
+        idx = h >> self._rest_bits
+        rest = h & ((1 << self._rest_bits) - 1)
+        rank = self._rest_bits - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def count(self) -> int:
+        m = self.m
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return round(estimate)
+
+def _token_hash(digest) -> int:
+    return int.from_bytes(digest.digest(), "big")
+
+_TOKEN = re.compile(r"[A-Za-z']+")
+_TOKEN_CHARS = string.ascii_letters + "'"
+LONG_WORD_CHARS = 12
+
+class _PendingToken:
+    """Token cut by a chunk boundary, kept as its length and a running hash (the same
+    one HyperLogLog.add computes), so a file without separators cannot grow it."""
+
+    def __init__(self):
+        self.length, self.digest = 0, hashlib.blake2b(digest_size=8)
+
+    def extend(self, part: str):
+        self.length += len(part)
+        self.digest.update(part.encode())
+
+    def finish(self, distinct: HyperLogLog) -> int:
+        """Count the finished token in `distinct`; returns its length (0 if none was pending)."""
+        length = self.length
+        if length:
+            distinct.add_hash(_token_hash(self.digest))
+            self.length, self.digest = 0, hashlib.blake2b(digest_size=8)
+        return length
+
+@register(".txt", name="text", version=4)
+def analyze_text(path: str, report: dict) -> int:
+    """Single pass over CHUNK_CHARS pieces with incremental counters; memory stays
+    bounded by the chunk size regardless of file size."""
+    tokens = long_words = letters = chars = 0
+    distinct = HyperLogLog()
+    pending = _PendingToken()
+
+    def finish_pending():
+        nonlocal tokens, long_words
+        length = pending.finish(distinct)
+        if length:
+            tokens += 1
+            long_words += length >= LONG_WORD_CHARS
+
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        while chunk := f.read(CHUNK_CHARS):
+            chars += len(chunk)
+            letters += sum(map(str.isalpha, chunk))
+            body = chunk.rstrip(_TOKEN_CHARS)  # the trailing token may continue in the next chunk
+            tail = chunk[len(body):]
+            if body:
+                rest = body.lstrip(_TOKEN_CHARS)
+                pending.extend(body[:len(body) - len(rest)])  # completes a token from the previous chunk
+                finish_pending()
+                toks = _TOKEN.findall(rest)
+                tokens += len(toks)
+                long_words += sum(len(t) >= LONG_WORD_CHARS for t in toks)
+                for tok in set(toks):
+                    distinct.add(tok)
+            pending.extend(tail)
+    finish_pending()
+    ratio_letters = letters / max(1, chars)
+    report["type"] = "text"
+    report["stats"] = {
+        "tokens": tokens,
+        "unique_tokens": min(tokens, distinct.count()),  # approximate
+        "long_words": long_words,
+        "letters_ratio": round(ratio_letters, 3)
+    }
+    if long_words > 20:
+        report["notes"].append("High count of long words — check for spacing or typos.")
+    if ratio_letters < 0.6:
+        report["notes"].append("Low letters ratio — file may include many symbols or be poorly scanned.")
+    return os.path.getsize(path)
+
+@register("", name="generic")
+def analyze_generic(path: str, report: dict) -> int:
+    report["summary"] = "Non-text file: demo pre-check limited (no OCR)."
+    return 0
+
+def analyze_file(path: str, name: str | None = None) -> dict:
     """Very simple heuristic 'AI pre-check' placeholder.
-    - For .txt files: basic token stats + naive 'long words' count
-    - For other types: mark as 'not analyzed in demo'
+    Dispatches on the extension of `name` (the original filename; `path` may be a
+    blob without one) to a registered analyzer and records its throughput.
     """
-    name = os.path.basename(path)
+    name = name or os.path.basename(path)
+    analyzer = analyzer_for(name)
     report = {
         "filename": name,
         "type": "generic",
         "summary": "Basic pre-check completed.",
         "stats": {},
-        "notes": []
+        "notes": [],
+        "analyzer": {"name": analyzer.name, "version": analyzer.version},
+    }
+    started = time.perf_counter()
+    size = 0
+    try:
+        size = analyzer.func(path, report)
+    except Exception as e:
+        report["summary"] = f"Error reading file: {e}"
+    elapsed = time.perf_counter() - started
+    report["analyzer"] |= {
+        "bytes": size,
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "mb_per_s": round(size / 1e6 / elapsed, 2) if size and elapsed > 0 else None,
     }
-    if path.lower().endswith(".txt"):
-        try:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                text = f.read()
-            tokens = re.findall(r"[A-Za-z']+", text)
-            long_words = [t for t in tokens if len(t) >= 12]
-            ratio_letters = sum(ch.isalpha() for ch in text) / max(1, len(text))
-            report["type"] = "text"
-            report["stats"] = {
-                "tokens": len(tokens),
-                "unique_tokens": len(set(tokens)),
-                "long_words": len(long_words),
-                "letters_ratio": round(ratio_letters, 3)
-            }
-            if len(long_words) > 20:
-                report["notes"].append("High count of long words — check for spacing or typos.")
-            if ratio_letters < 0.6:
-                report["notes"].append("Low letters ratio — file may include many symbols or be poorly scanned.")
-        except Exception as e:
-            report["summary"] = f"Error reading text: {e}"
-    else:
-        report["summary"] = "Non-text file: demo pre-check limited (no OCR)."
     return report
+
+def extract_text(path: str, name: str | None = None, max_chars: int = EXTRACTED_TEXT_MAX_CHARS) -> str | None:
+    """Plain text to full-text index for the assignment (first `max_chars` of .txt files)."""
+    name = name or os.path.basename(path)
+    if not name.lower().endswith(".txt"):
+        return None
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read(max_chars)
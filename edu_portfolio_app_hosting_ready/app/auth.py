@@ -1,25 +1,41 @@
+import time
 from fastapi import APIRouter, Depends, Request, Form
 from fastapi.responses import RedirectResponse, HTMLResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from .database import get_db
-from . import crud, models
+from .metrics import Counter, Histogram
+from . import crud, models, passwords
 
 router = APIRouter()
 
+login_attempts = Counter("login_attempts_total", "Login form submissions")
+login_failures = Counter("login_failures_total", "Logins rejected for bad credentials")
+login_latency = Histogram("login_latency_seconds", "Time to handle a login, including bcrypt")
+
+def _form_page(request: Request, template: str, error: str | None = None) -> HTMLResponse:
+    return HTMLResponse(request.app.state.templates.get_template(template).render({"request": request, "error": error}))
+
 @router.get("/login", response_class=HTMLResponse)
 def login_page(request: Request):
-    return request.app.state.templates.TemplateResponse("login.html", {"request": request, "error": None})
+    return _form_page(request, "login.html")
 
 @router.post("/login")
-def login(request: Request, email: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    user = crud.get_user_by_email(db, email)
-    if not user or not crud.verify_password(user.hashed_password, password):
-        return request.app.state.templates.TemplateResponse("login.html", {"request": request, "error": "Invalid credentials"})
-    request.session["user"] = {"id": user.id, "email": user.email, "role": user.role.value}
-    if user.role == models.RoleEnum.teacher:
-        return RedirectResponse(url="/teacher/dashboard", status_code=303)
-    else:
-        return RedirectResponse(url="/student/dashboard", status_code=303)
+async def login(request: Request, email: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
+    started = time.perf_counter()
+    login_attempts.inc()
+    try:
+        user = await run_in_threadpool(crud.get_user_record, db, email)
+        if not user or not await passwords.verify_password(user.hashed_password, password):
+            login_failures.inc()
+            return _form_page(request, "login.html", "Invalid credentials")
+        request.session["user"] = {"id": user.id, "email": user.email, "role": user.role.value}
+        if user.role == models.RoleEnum.teacher:
+            return RedirectResponse(url="/teacher/dashboard", status_code=303)
+        else:
+            return RedirectResponse(url="/student/dashboard", status_code=303)
+    finally:
+        login_latency.observe(time.perf_counter() - started)
 
 @router.get("/logout")
 def logout(request: Request):
@@ -29,14 +45,15 @@ def logout(request: Request):
 # Temporary registration route for demo
 @router.get("/register", response_class=HTMLResponse)
 def register_page(request: Request):
-    return request.app.state.templates.TemplateResponse("register.html", {"request": request, "error": None})
+    return _form_page(request, "register.html")
 
 @router.post("/register")
-def register(request: Request, email: str = Form(...), password: str = Form(...), role: str = Form(...), db: Session = Depends(get_db)):
-    if crud.get_user_by_email(db, email):
-        return request.app.state.templates.TemplateResponse("register.html", {"request": request, "error": "Email already registered"})
+async def register(request: Request, email: str = Form(...), password: str = Form(...), role: str = Form(...), db: Session = Depends(get_db)):
+    if await run_in_threadpool(crud.get_user_record, db, email):
+        return _form_page(request, "register.html", "Email already registered")
     role_enum = models.RoleEnum(role)
-    user = crud.create_user(db, email, password, role_enum)
+    hashed_password = await passwords.hash_password(password)
+    user = await run_in_threadpool(crud.create_user, db, email, None, role_enum, hashed_password=hashed_password)
     request.session["user"] = {"id": user.id, "email": user.email, "role": user.role.value}
     if role_enum == models.RoleEnum.teacher:
         return RedirectResponse(url="/teacher/dashboard", status_code=303)
@@ -1,57 +1,456 @@
-from sqlalchemy.orm import Session
+import os, json, time, base64, threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, insert, select, update, case, func
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
 from passlib.hash import bcrypt
-from . import models
+from . import models, search
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+
+# Detached copy of the columns login needs; safe to share between sessions and threads
+UserRecord = namedtuple("UserRecord", "id email hashed_password role")
+_user_cache: dict[str, tuple[float, UserRecord]] = {}
+_user_cache_lock = threading.Lock()
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def create_user(db: Session, email: str, password: str, role: models.RoleEnum):
-    hashed_password = bcrypt.hash(password)
+def get_user_record(db: Session, email: str) -> UserRecord | None:
+    """get_user_by_email behind a short TTL cache. Misses are not cached, so a user
+    registered by another worker can log in immediately."""
+    now = time.monotonic()
+    with _user_cache_lock:
+        hit = _user_cache.get(email)
+        if hit and hit[0] > now:
+            return hit[1]
+    u = get_user_by_email(db, email)
+    if u is None:
+        return None
+    record = UserRecord(u.id, u.email, u.hashed_password, u.role)
+    with _user_cache_lock:
+        if len(_user_cache) >= USER_CACHE_SIZE:
+            _user_cache.clear()
+        _user_cache[email] = (now + USER_CACHE_TTL, record)
+    return record
+
+def invalidate_user_cache(email: str | None = None):
+    with _user_cache_lock:
+        if email is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(email, None)
+
+def list_teacher_ids(db: Session) -> list[int]:
+    return list(db.scalars(select(models.User.id).where(models.User.role == models.RoleEnum.teacher)))
+
+def hash_password(password: str) -> str:
+    return bcrypt.using(rounds=BCRYPT_ROUNDS).hash(password)
+
+def create_user(db: Session, email: str, password: str | None, role: models.RoleEnum, hashed_password: str | None = None):
+    """Pass `hashed_password` when the hash was computed elsewhere (see passwords.py)."""
+    hashed_password = hashed_password or hash_password(password)
     user = models.User(email=email, hashed_password=hashed_password, role=role)
     db.add(user)
     db.commit()
     db.refresh(user)
+    invalidate_user_cache(email)
     return user
 
 def verify_password(hashed_password: str, password: str) -> bool:
     return bcrypt.verify(password, hashed_password)
 
-def create_assignment(db: Session, student_id: int, stored_filename: str, original_name: str):
-    a = models.Assignment(student_id=student_id, filename=stored_filename, original_name=original_name)
-    db.add(a); db.commit(); db.refresh(a)
+def _upsert(db: Session):
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+def assignment_cache_keys(student_id: int) -> list[str]:
+    """Fragment cache keys to bump whenever a student's assignments change."""
+    return ["assignments", f"student:{student_id}"]
+
+def bump_cache_versions(db: Session, keys: list[str]):
+    """Invalidate cached fragments depending on `keys` (see fragments.py). Caller commits,
+    so the bump lands in the same transaction as the write."""
+    V = models.CacheVersion
+    for key in sorted(set(keys)):  # fixed order avoids lock-order deadlocks on Postgres
+        stmt = _upsert(db)(V).values(key=key, version=1)
+        db.execute(stmt.on_conflict_do_update(index_elements=[V.key], set_={"version": V.version + 1}))
+
+def get_cache_versions(db: Session, keys: list[str]) -> dict[str, int]:
+    V = models.CacheVersion
+    found = dict(db.query(V.key, V.version).filter(V.key.in_(keys)).all())
+    return {k: found.get(k, 0) for k in keys}
+
+def acquire_blob(db: Session, sha256: str, size: int):
+    """Add a reference to a blob, creating its row if needed. Caller commits."""
+    stmt = _upsert(db)(models.Blob).values(sha256=sha256, size=size, refcount=1, created_at=datetime.utcnow())
+    stmt = stmt.on_conflict_do_update(index_elements=[models.Blob.sha256], set_={"refcount": models.Blob.refcount + 1})
+    db.execute(stmt)
+
+def _add_assignment(db: Session, student_id: int, uploaded_at: datetime, stored_filename: str, original_name: str,
+                    precheck_path: str | None = None, content_hash: str | None = None, size: int | None = None) -> models.Assignment:
+    a = models.Assignment(student_id=student_id, filename=stored_filename, original_name=original_name, content_hash=content_hash, size=size,
+                          uploaded_at=uploaded_at)
+    db.add(a)
+    if content_hash:
+        acquire_blob(db, content_hash, size or 0)
+    if precheck_path:
+        # queued in the same transaction so a stored assignment always has its job
+        db.add(models.PrecheckJob(assignment=a, path=precheck_path))
     return a
 
+def create_assignment(db: Session, student_id: int, stored_filename: str, original_name: str, precheck_path: str | None = None,
+                      content_hash: str | None = None, size: int | None = None):
+    now = datetime.utcnow()  # one timestamp, so the summary's last_upload_at equals the row's uploaded_at
+    a = _add_assignment(db, student_id, now, stored_filename, original_name, precheck_path, content_hash, size)
+    bump_cache_versions(db, assignment_cache_keys(student_id))
+    bump_student_summary(db, student_id, last_upload_at=now, total=1, submitted=1)
+    db.commit(); db.refresh(a)
+    return a
+
+def create_assignments(db: Session, student_id: int, uploads: list[dict]) -> list[models.Assignment]:
+    """Insert several uploads for one student in a single transaction; each dict holds
+    create_assignment's keyword arguments (stored_filename, original_name, ...)."""
+    now = datetime.utcnow()
+    items = [_add_assignment(db, student_id, now, **u) for u in uploads]
+    bump_cache_versions(db, assignment_cache_keys(student_id))
+    bump_student_summary(db, student_id, last_upload_at=now, total=len(items), submitted=len(items))
+    db.commit()
+    return items
+
 def list_student_assignments(db: Session, student_id: int, q: str | None = None, status: str | None = None):
     query = db.query(models.Assignment).filter(models.Assignment.student_id == student_id)
     if q:
-        query = query.filter(models.Assignment.original_name.ilike(f"%{q}%"))
+        query = query.filter(search.match(q))
     if status:
         query = query.filter(models.Assignment.status == status)
     return query.order_by(models.Assignment.uploaded_at.desc()).all()
 
-def list_all_assignments(db: Session):
-    return db.query(models.Assignment).order_by(models.Assignment.uploaded_at.desc()).all()
+def encode_cursor(a: models.Assignment) -> str:
+    raw = f"{a.uploaded_at.isoformat()}|{a.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int] | None:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, id_ = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(id_)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def clamp_page_size(limit: int | None) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+def list_assignments_page(db: Session, cursor: str | None = None, limit: int | None = None):
+    """Keyset-paginated assignments, newest first, with students eager-loaded.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    limit = clamp_page_size(limit)
+    A = models.Assignment
+    query = db.query(A).options(joinedload(A.student))
+    after = decode_cursor(cursor) if cursor else None
+    if after:
+        ts, id_ = after
+        query = query.filter(or_(A.uploaded_at < ts, and_(A.uploaded_at == ts, A.id < id_)))
+    rows = query.order_by(A.uploaded_at.desc(), A.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def list_recent_assignments(db: Session, student_id: int, limit: int = 10):
+    A = models.Assignment
+    return db.query(A).filter(A.student_id == student_id).order_by(A.uploaded_at.desc()).limit(limit).all()
+
+SUMMARY_COUNTERS = ("total", *(s.value for s in models.AssignmentStatus), "prechecked", "precheck_failed",
+                    "stats_count", "tokens_sum", "long_words_sum", "letters_ratio_sum")
+
+def _precheck_deltas(report_json: str | None) -> dict:
+    """Summary counters contributed by one finished pre-check report."""
+    try:
+        stats = json.loads(report_json).get("stats") or {}
+    except (TypeError, ValueError, AttributeError):
+        stats = {}
+    deltas = {"prechecked": 1}
+    if "tokens" in stats:
+        deltas |= {"stats_count": 1, "tokens_sum": stats["tokens"], "long_words_sum": stats.get("long_words", 0),
+                   "letters_ratio_sum": stats.get("letters_ratio", 0.0)}
+    return deltas
+
+def bump_student_summary(db: Session, student_id: int, last_upload_at: datetime | None = None, **deltas):
+    """Add `deltas` (e.g. total=1, submitted=1) to a student's summary, creating the row
+    if needed. Caller commits, so the summary changes with the assignments it counts."""
+    S = models.StudentSummary
+    now = datetime.utcnow()
+    values = {k: 0 for k in SUMMARY_COUNTERS} | deltas | {"student_id": student_id, "last_upload_at": last_upload_at, "updated_at": now}
+    set_ = {k: getattr(S, k) + v for k, v in deltas.items()} | {"updated_at": now}
+    if last_upload_at:
+        set_["last_upload_at"] = last_upload_at
+    db.execute(_upsert(db)(S).values(**values).on_conflict_do_update(index_elements=[S.student_id], set_=set_))
+
+def refresh_student_summaries(db: Session, student_ids: list[int] | None = None):
+    """Recompute summaries from the assignments table, for every student or just
+    `student_ids`; for writes whose deltas are unknown (bulk UPDATEs, backfills,
+    databases from before the table existed). Caller commits."""
+    A, S = models.Assignment, models.StudentSummary
+    rows: dict[int, dict] = {}
+    query = db.query(A.student_id, A.status, A.precheck_status, A.uploaded_at, A.ai_report)
+    if student_ids is not None:
+        query = query.filter(A.student_id.in_(student_ids))
+    for student_id, status, precheck_status, uploaded_at, report in query.yield_per(5000):
+        r = rows.setdefault(student_id, {k: 0 for k in SUMMARY_COUNTERS} | {"student_id": student_id, "last_upload_at": None})
+        r["total"] += 1
+        r[status.value] += 1
+        if uploaded_at and (r["last_upload_at"] is None or uploaded_at > r["last_upload_at"]):
+            r["last_upload_at"] = uploaded_at
+        if precheck_status == models.PrecheckStatus.done:
+            for k, v in _precheck_deltas(report).items():
+                r[k] += v
+        elif precheck_status == models.PrecheckStatus.failed:
+            r["precheck_failed"] += 1
+    stale = db.query(S)
+    if student_ids is not None:
+        stale = stale.filter(S.student_id.in_(student_ids))
+    stale.delete(synchronize_session=False)
+    now = datetime.utcnow()
+    if rows:
+        db.execute(insert(S), [r | {"updated_at": now} for r in rows.values()])
+
+def ensure_student_summaries(db: Session):
+    """Build the summaries once for a database that has assignments but no summaries yet."""
+    if db.query(models.StudentSummary.student_id).first() or not db.query(models.Assignment.id).first():
+        return
+    try:
+        refresh_student_summaries(db)
+        db.commit()
+    except IntegrityError:  # another worker built them first
+        db.rollback()
+
+def summary_dict(s) -> dict:
+    """API/template shape of a StudentSummary (or any row with the same columns); None
+    for a student without assignments."""
+    if s is None:
+        s = models.StudentSummary(**{k: 0 for k in SUMMARY_COUNTERS})
+    n = s.stats_count
+    return {
+        "counts": {"total": s.total} | {st.value: getattr(s, st.value) for st in models.AssignmentStatus},
+        "last_upload_at": s.last_upload_at,
+        "precheck": {
+            "done": s.prechecked,
+            "failed": s.precheck_failed,
+            "avg_tokens": round(s.tokens_sum / n, 1) if n else None,
+            "avg_long_words": round(s.long_words_sum / n, 2) if n else None,
+            "avg_letters_ratio": round(s.letters_ratio_sum / n, 3) if n else None,
+        },
+    }
+
+def get_student_summary(db: Session, student_id: int) -> models.StudentSummary | None:
+    return db.get(models.StudentSummary, student_id)
+
+def student_summaries(db: Session) -> dict[int, models.StudentSummary]:
+    return {s.student_id: s for s in db.query(models.StudentSummary)}
 
-def save_ai_report(db: Session, assignment_id: int, report_json: str):
-    a = db.query(models.Assignment).get(assignment_id)
-    if a:
+def class_summary(db: Session) -> dict:
+    """Totals over every student, summed from the per-student rows (one row per
+    student, never per assignment); `students` counts students with assignments."""
+    S = models.StudentSummary
+    cols = [func.coalesce(func.sum(getattr(S, k)), 0).label(k) for k in SUMMARY_COUNTERS]
+    row = db.query(*cols, func.max(S.last_upload_at).label("last_upload_at"), func.count(S.student_id).label("students")).one()
+    return summary_dict(row) | {"students": row.students}
+
+def recent_assignments_by_student(db: Session, per_student: int = 10) -> dict[int, list]:
+    """Each student's newest `per_student` assignments, in one windowed query."""
+    A = models.Assignment
+    rn = func.row_number().over(partition_by=A.student_id, order_by=(A.uploaded_at.desc(), A.id.desc())).label("rn")
+    sub = db.query(A.id, A.student_id, A.original_name, A.status, A.uploaded_at, rn).subquery()
+    rows = db.query(sub).filter(sub.c.rn <= per_student).order_by(sub.c.student_id, sub.c.rn).all()
+    grouped: dict[int, list] = {}
+    for r in rows:
+        grouped.setdefault(r.student_id, []).append(r)
+    return grouped
+
+def list_students(db: Session) -> list[tuple[int, str]]:
+    U = models.User
+    return db.query(U.id, U.email).filter(U.role == models.RoleEnum.student).order_by(U.email).all()
+
+def claim_precheck_jobs(db: Session, limit: int) -> list[models.PrecheckJob]:
+    """Atomically move up to `limit` queued jobs to running. Safe with several app workers."""
+    J = models.PrecheckJob
+    candidates = db.query(J.id).filter(J.state == models.JobState.queued).order_by(J.id).limit(limit).all()
+    claimed = []
+    for (job_id,) in candidates:
+        n = db.query(J).filter(J.id == job_id, J.state == models.JobState.queued).update(
+            {J.state: models.JobState.running, J.attempts: J.attempts + 1, J.updated_at: datetime.utcnow()},
+            synchronize_session=False)
+        if n:
+            claimed.append(job_id)
+    db.commit()
+    return db.query(J).filter(J.id.in_(claimed)).all() if claimed else []
+
+def requeue_running_jobs(db: Session, lease_seconds: float) -> int:
+    """Return jobs orphaned by a crashed worker to the queue: running jobs whose claim
+    is older than `lease_seconds`. Fresher ones may belong to another live process."""
+    J = models.PrecheckJob
+    expired = datetime.utcnow() - timedelta(seconds=lease_seconds)
+    n = db.query(J).filter(J.state == models.JobState.running, J.updated_at < expired).update(
+        {J.state: models.JobState.queued, J.updated_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return n
+
+def finish_precheck_job(db: Session, job_id: int, report_json: str | None = None, error: str | None = None, max_attempts: int = 3,
+                        extracted_text: str | None = None, cache: tuple[str, int, int] | None = None):
+    """Record a job outcome. `cache` = (analyzer, version, max_bytes) also memoizes a fresh result by content hash.
+    A no-op unless the job is still running (its lease may have expired and been requeued)."""
+    job = db.get(models.PrecheckJob, job_id, with_for_update=True)  # a requeued copy may finish concurrently
+    if not job or job.state != models.JobState.running:
+        return None
+    a = job.assignment
+    if error is None:
+        job.state = models.JobState.done
+        job.error = None
         a.ai_report = report_json
+        a.extracted_text = extracted_text
+        a.precheck_status = models.PrecheckStatus.done
+        bump_student_summary(db, a.student_id, **_precheck_deltas(report_json))
+        if cache and a.content_hash:
+            analyzer, version, max_bytes = cache
+            store_precheck_result(db, a.content_hash, analyzer, version, report_json, extracted_text, max_bytes, commit=False)
+    else:
+        job.error = error
+        if job.attempts >= max_attempts:
+            job.state = models.JobState.failed
+            a.precheck_status = models.PrecheckStatus.failed
+            bump_student_summary(db, a.student_id, precheck_failed=1)
+        else:
+            job.state = models.JobState.queued
+    db.commit()
+    return job
+
+def get_precheck_result(db: Session, content_hash: str, analyzer: str, version: int) -> models.PrecheckResult | None:
+    """Cached result for these bytes from the current analyzer version, if any."""
+    r = db.get(models.PrecheckResult, (content_hash, analyzer))
+    if not r or r.analyzer_version != version:
+        return None
+    r.last_used_at = datetime.utcnow()
+    db.commit()
+    return r
+
+def store_precheck_result(db: Session, content_hash: str, analyzer: str, version: int, report_json: str,
+                          extracted_text: str | None, max_bytes: int, commit: bool = True):
+    size = len(report_json) + len(extracted_text or "")
+    r = db.get(models.PrecheckResult, (content_hash, analyzer))
+    if r is None:
+        r = models.PrecheckResult(content_hash=content_hash, analyzer=analyzer)
+        db.add(r)
+    _add_precheck_cache_bytes(db, size - (r.size or 0))
+    r.analyzer_version, r.report, r.extracted_text, r.size = version, report_json, extracted_text, size
+    r.created_at = r.last_used_at = datetime.utcnow()
+    db.flush()
+    evict_precheck_results(db, max_bytes)
+    if commit:
         db.commit()
-        db.refresh(a)
-    return a
 
-def save_feedback(db: Session, assignment_id: int, feedback: str, status: models.AssignmentStatus):
-    a = db.query(models.Assignment).get(assignment_id)
-    if a:
-        a.teacher_feedback = feedback
-        a.status = status
+def delete_precheck_result(db: Session, content_hash: str, analyzer: str):
+    """Drop one memoized result. Caller commits."""
+    P = models.PrecheckResult
+    size = db.query(P.size).filter(P.content_hash == content_hash, P.analyzer == analyzer).scalar()
+    if size is not None:
+        db.query(P).filter(P.content_hash == content_hash, P.analyzer == analyzer).delete(synchronize_session=False)
+        _add_precheck_cache_bytes(db, -size)
+
+def _precheck_results_bytes(db: Session) -> int:
+    return db.query(func.coalesce(func.sum(models.PrecheckResult.size), 0)).scalar() or 0
+
+def _add_precheck_cache_bytes(db: Session, delta: int):
+    C = models.PrecheckCacheSize
+    if delta:
+        db.query(C).filter(C.id == 1).update({C.total_bytes: C.total_bytes + delta}, synchronize_session=False)
+
+def ensure_precheck_cache_size(db: Session):
+    """Seed the running total of memoized result sizes once, for a database that predates it."""
+    if db.get(models.PrecheckCacheSize, 1) is not None:
+        return
+    try:
+        db.add(models.PrecheckCacheSize(id=1, total_bytes=_precheck_results_bytes(db)))
         db.commit()
-        db.refresh(a)
-    return a
+    except IntegrityError:  # another worker seeded it first
+        db.rollback()
+
+def evict_precheck_results(db: Session, max_bytes: int):
+    """Drop least recently used cache rows until the cache fits in max_bytes."""
+    P, C = models.PrecheckResult, models.PrecheckCacheSize
+    total = db.query(C.total_bytes).filter(C.id == 1).scalar() or 0
+    if total <= max_bytes:
+        return
+    victims, freed = [], 0
+    for content_hash, analyzer, size in db.query(P.content_hash, P.analyzer, P.size).order_by(P.last_used_at).yield_per(500):
+        victims.append((content_hash, analyzer))
+        freed += size
+        if total - freed <= max_bytes:
+            break
+    for content_hash, analyzer in victims:
+        db.query(P).filter(P.content_hash == content_hash, P.analyzer == analyzer).delete(synchronize_session=False)
+    _add_precheck_cache_bytes(db, -freed)
+
+def stale_precheck_results(db: Session, current_versions: dict[str, int]) -> list[tuple[str, str]]:
+    """(content_hash, analyzer) of memoized results not made by the current version of their analyzer."""
+    P = models.PrecheckResult
+    stale = or_(P.analyzer.notin_(current_versions),
+                *(and_(P.analyzer == name, P.analyzer_version != version) for name, version in current_versions.items()))
+    return db.query(P.content_hash, P.analyzer).filter(stale).all()
+
+def save_feedback(db: Session, assignment_id: int, feedback: str, status: models.AssignmentStatus):
+    A = models.Assignment
+    # write first: the UPDATE locks the row (and takes SQLite's write lock), so the status it
+    # returns is the one this transaction replaces and concurrent saves cannot both count a move
+    row = db.execute(update(A).where(A.id == assignment_id).values(teacher_feedback=feedback).returning(A.student_id, A.status),
+                     execution_options={"synchronize_session": False}).first()
+    if row is None:
+        db.rollback()
+        return None
+    moved = {}
+    if row.status != status:
+        db.execute(update(A).where(A.id == assignment_id).values(status=status), execution_options={"synchronize_session": False})
+        moved = {row.status.value: -1, status.value: 1}
+    bump_cache_versions(db, assignment_cache_keys(row.student_id))
+    bump_student_summary(db, row.student_id, **moved)
+    db.commit()
+    return db.get(A, assignment_id)
+
+def save_feedback_batch(db: Session, items: list[tuple[int, str | None]], status: models.AssignmentStatus) -> list[int]:
+    """Set `status` on every assignment in `items` and its feedback where one is given
+    (None keeps the current text), as a single UPDATE. Returns the ids that were found."""
+    A = models.Assignment
+    ids = sorted({aid for aid, _ in items})
+    if not ids:
+        return []
+    values = {A.status: status}
+    feedback = {aid: text for aid, text in items if text is not None}
+    if feedback:
+        values[A.teacher_feedback] = case(feedback, value=A.id, else_=A.teacher_feedback)
+    stmt = update(A).where(A.id.in_(ids)).values(values).returning(A.id, A.student_id)
+    rows = db.execute(stmt, execution_options={"synchronize_session": False}).all()
+    if rows:
+        student_ids = sorted({r.student_id for r in rows})
+        bump_cache_versions(db, [key for sid in student_ids for key in assignment_cache_keys(sid)])
+        refresh_student_summaries(db, student_ids)  # status moves aren't known without the old values
+    db.commit()
+    return sorted(r.id for r in rows)
 
-def create_material(db: Session, teacher_id: int, title: str, type_: models.MaterialType, path: str):
-    m = models.Material(teacher_id=teacher_id, title=title, type=type_, path=path)
-    db.add(m); db.commit(); db.refresh(m)
+def create_material(db: Session, teacher_id: int, title: str, type_: models.MaterialType, path: str,
+                    content_hash: str | None = None, size: int | None = None):
+    m = models.Material(teacher_id=teacher_id, title=title, type=type_, path=path, content_hash=content_hash, size=size)
+    db.add(m)
+    if content_hash:
+        acquire_blob(db, content_hash, size or 0)
+    bump_cache_versions(db, [f"materials:{teacher_id}"])
+    db.commit(); db.refresh(m)
     return m
 
 def list_materials(db: Session, teacher_id: int | None = None):
@@ -60,13 +459,28 @@ def list_materials(db: Session, teacher_id: int | None = None):
         q = q.filter(models.Material.teacher_id == teacher_id)
     return q.order_by(models.Material.uploaded_at.desc()).all()
 
-def add_notification(db: Session, user_id: int, message: str):
-    n = models.Notification(user_id=user_id, message=message)
-    db.add(n); db.commit(); db.refresh(n)
-    return n
+def add_notifications(db: Session, user_ids: list[int], message: str | list[str], commit: bool = True):
+    """Insert one notification per user (and per message) as a single multi-row INSERT."""
+    if not user_ids:
+        return
+    messages = [message] if isinstance(message, str) else message
+    now = datetime.utcnow()
+    db.execute(insert(models.Notification), [{"user_id": uid, "message": m, "created_at": now, "is_read": False}
+                                             for m in messages for uid in user_ids])
+    if commit:
+        db.commit()
+
+def list_notifications(db: Session, user_id: int, before_id: int | None = None, limit: int | None = None):
+    """Newest-first notifications for a user, keyset-paginated on id."""
+    N = models.Notification
+    query = db.query(N).filter(N.user_id == user_id)
+    if before_id:
+        query = query.filter(N.id < before_id)
+    return query.order_by(N.id.desc()).limit(clamp_page_size(limit)).all()
 
-def list_notifications(db: Session, user_id: int):
-    return db.query(models.Notification).filter(models.Notification.user_id == user_id).order_by(models.Notification.created_at.desc()).all()
+def count_unread_notifications(db: Session, user_id: int) -> int:
+    N = models.Notification
+    return db.query(func.count(N.id)).filter(N.user_id == user_id, N.is_read == False).scalar()  # noqa: E712
 
 def mark_notifications_read(db: Session, user_id: int):
     db.query(models.Notification).filter(models.Notification.user_id == user_id).update({models.Notification.is_read: True})
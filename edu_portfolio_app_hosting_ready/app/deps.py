@@ -1,24 +1,33 @@
+import inspect
 from fastapi import Request, HTTPException, status
 from functools import wraps
 
+def _guard(func, check):
+    # keep sync handlers sync so FastAPI still runs them in the threadpool
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            check(kwargs.get("request") or args[0])
+            return await func(*args, **kwargs)
+    else:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            check(kwargs.get("request") or args[0])
+            return func(*args, **kwargs)
+    return wrapper
+
 def require_login(func):
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        request: Request = kwargs.get("request") or args[0]
+    def check(request: Request):
         user = request.session.get("user")
         if not user:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Login required")
-        return await func(*args, **kwargs)
-    return wrapper
+    return _guard(func, check)
 
 def require_role(role: str):
     def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            request: Request = kwargs.get("request") or args[0]
+        def check(request: Request):
             user = request.session.get("user")
             if not user or user.get("role") != role:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
-            return await func(*args, **kwargs)
-        return wrapper
+        return _guard(func, check)
     return decorator
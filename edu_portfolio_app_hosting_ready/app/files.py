@@ -0,0 +1,104 @@
+import os, re, mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request, HTTPException
+from fastapi.responses import Response, FileResponse, StreamingResponse
+from .storage import BLOB_DIR, CHUNK_SIZE, blob_hash, resolve
+
+# Blobs never change under a given name, so they can be cached for a year.
+# Files are login-protected, hence "private" by default; set these to public
+# values only behind a CDN that varies on the session cookie.
+CACHE_CONTROL_BLOB = os.environ.get("FILE_CACHE_CONTROL_BLOB", "private, max-age=31536000, immutable")
+CACHE_CONTROL_LEGACY = os.environ.get("FILE_CACHE_CONTROL_LEGACY", "private, max-age=3600")
+# "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd) hands the bytes to the front server
+SENDFILE_MODE = os.environ.get("FILE_SENDFILE_MODE", "").lower()
+ACCEL_PREFIX = os.environ.get("FILE_ACCEL_PREFIX", "/_protected/blobs")  # nginx `internal` location aliased to BLOB_DIR
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # weak comparison, as If-None-Match requires
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag.removeprefix("W/") in tags
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return _etag_matches(inm, etag)
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Single byte range -> inclusive (start, end); None for unsupported forms (serve 200)."""
+    m = _RANGE.match(header.strip())
+    if not m:
+        return None
+    first, last = m.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":  # suffix: last N bytes
+        n = int(last)
+        if n == 0 or size == 0:  # nothing to return; an empty file satisfies no range
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(0, size - n), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _read_range(path: str, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def serve_file(request: Request, name: str, legacy_dir: str) -> Response:
+    """Serve an uploaded file with validators, conditional GET and byte ranges."""
+    path = resolve(name, legacy_dir)
+    try:
+        st = os.stat(path) if path else None
+    except FileNotFoundError:
+        st = None
+    if st is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    sha = blob_hash(name)
+    etag = f'"{sha}"' if sha else f'W/"{int(st.st_mtime)}-{st.st_size}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": CACHE_CONTROL_BLOB if sha else CACHE_CONTROL_LEGACY,
+        "Accept-Ranges": "bytes",
+    }
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if _not_modified(request, etag, st.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    if SENDFILE_MODE == "x-accel-redirect" and sha:
+        # nginx serves the bytes (and handles Range itself) from an internal location
+        rel = os.path.relpath(path, BLOB_DIR).replace(os.sep, "/")
+        return Response(headers=headers | {"X-Accel-Redirect": f"{ACCEL_PREFIX}/{rel}"}, media_type=media_type)
+    if SENDFILE_MODE == "x-sendfile":
+        return Response(headers=headers | {"X-Sendfile": os.path.abspath(path)}, media_type=media_type)
+
+    range_header = request.headers.get("range")
+    if range_header:
+        if_range = request.headers.get("if-range")
+        byte_range = None if if_range and if_range != etag else _parse_range(range_header, st.st_size)
+        if byte_range:
+            start, end = byte_range
+            headers |= {"Content-Range": f"bytes {start}-{end}/{st.st_size}", "Content-Length": str(end - start + 1)}
+            return StreamingResponse(_read_range(path, start, end), status_code=206, headers=headers, media_type=media_type)
+    return FileResponse(path, stat_result=st, headers=headers, media_type=media_type)
@@ -0,0 +1,39 @@
+import os, threading
+from collections import OrderedDict
+from typing import Callable
+from markupsafe import Markup
+from sqlalchemy.orm import Session
+from . import crud
+
+FRAGMENT_CACHE_SIZE = int(os.environ.get("FRAGMENT_CACHE_SIZE", "2048"))
+
+class FragmentCache:
+    """LRU of rendered HTML fragments. Entries are keyed on the current versions of
+    the cache keys they depend on (stored in the database, so a bump from any worker
+    invalidates every worker's copy)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, Markup] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, db: Session, name: str, depends_on: list[str], render: Callable[[], str]) -> Markup:
+        versions = crud.get_cache_versions(db, depends_on)
+        key = (name, tuple(sorted(versions.items())))
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                return html
+        html = Markup(render())
+        with self._lock:
+            self._entries[key] = html
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+fragment_cache = FragmentCache(FRAGMENT_CACHE_SIZE)
@@ -0,0 +1,126 @@
+import os, json, asyncio, logging
+from concurrent.futures import ProcessPoolExecutor
+from .database import SessionLocal
+from .ai_precheck import analyze_file, analyzer_for, extract_text
+from . import crud, metrics
+
+log = logging.getLogger(__name__)
+
+PRECHECK_WORKERS = int(os.environ.get("PRECHECK_WORKERS", min(4, os.cpu_count() or 1)))
+PRECHECK_POLL_SECONDS = float(os.environ.get("PRECHECK_POLL_SECONDS", "5"))
+PRECHECK_MAX_ATTEMPTS = int(os.environ.get("PRECHECK_MAX_ATTEMPTS", "3"))
+PRECHECK_LEASE_SECONDS = float(os.environ.get("PRECHECK_LEASE_SECONDS", "600"))  # a running job older than this is presumed orphaned
+PRECHECK_MAX_BACKOFF_SECONDS = float(os.environ.get("PRECHECK_MAX_BACKOFF_SECONDS", "60"))
+PRECHECK_CACHE_MAX_BYTES = int(os.environ.get("PRECHECK_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+def run_precheck(path: str, name: str) -> tuple[str, str | None]:
+    """Pool entry point: report JSON plus the text to index for search."""
+    return json.dumps(analyze_file(path, name)), extract_text(path, name)
+
+def with_filename(report_json: str, name: str) -> str:
+    """A memoized report was produced for another upload of the same bytes; show this one's name."""
+    report = json.loads(report_json)
+    report["filename"] = name
+    return json.dumps(report)
+
+class PrecheckWorker:
+    """Drains the persistent precheck_jobs table, running analyze_file on a process pool.
+    Uploads only insert a job row and call wake(); the poll interval picks up jobs
+    enqueued by other app processes.
+    """
+
+    def __init__(self, workers: int = PRECHECK_WORKERS, poll_seconds: float = PRECHECK_POLL_SECONDS):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._pool: ProcessPoolExecutor | None = None
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def wake(self):
+        # callable from any thread (sync handlers run in the threadpool)
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        backoff = 1.0
+        while True:
+            try:
+                jobs = await asyncio.to_thread(self._claim)
+            except Exception:  # e.g. "database is locked" during an upload burst; keep the worker alive
+                log.exception("claiming precheck jobs failed; retrying in %.0fs", backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, PRECHECK_MAX_BACKOFF_SECONDS)
+                continue
+            backoff = 1.0
+            if jobs:
+                await asyncio.gather(*(self._process(*job) for job in jobs))
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def _claim(self) -> list[tuple[int, str, str, str | None]]:
+        with SessionLocal() as db:
+            n = crud.requeue_running_jobs(db, PRECHECK_LEASE_SECONDS)
+            if n:
+                log.info("requeued %d precheck jobs with expired leases", n)
+            return [(j.id, j.path, j.assignment.original_name, j.assignment.content_hash)
+                    for j in crud.claim_precheck_jobs(db, limit=self.workers * 2)]
+
+    async def _process(self, job_id: int, path: str, name: str, content_hash: str | None):
+        # one job's DB error must not cancel its siblings in gather() or stop the loop;
+        # a job left running is requeued once its lease expires
+        try:
+            await self._process_job(job_id, path, name, content_hash)
+        except Exception:
+            log.exception("precheck job %s could not be completed", job_id)
+
+    async def _process_job(self, job_id: int, path: str, name: str, content_hash: str | None):
+        analyzer = analyzer_for(name)
+        cached = await asyncio.to_thread(self._cached, content_hash, analyzer.name, analyzer.version) if content_hash else None
+        if cached:
+            metrics.precheck_cache_hits.inc()
+            report_json, extracted = cached
+            await asyncio.to_thread(self._finish, job_id, with_filename(report_json, name), None, extracted, None)
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.stage("precheck"):
+                result, extracted = await loop.run_in_executor(self._pool, run_precheck, path, name)
+            error = None
+        except Exception as e:
+            log.exception("precheck job %s failed", job_id)
+            result, extracted, error = None, None, repr(e)
+        await asyncio.to_thread(self._finish, job_id, result, error, extracted,
+                                (analyzer.name, analyzer.version, PRECHECK_CACHE_MAX_BYTES))
+
+    def _cached(self, content_hash: str, analyzer: str, version: int) -> tuple[str, str | None] | None:
+        with SessionLocal() as db:
+            r = crud.get_precheck_result(db, content_hash, analyzer, version)
+            return (r.report, r.extracted_text) if r else None
+
+    def _finish(self, job_id: int, report_json: str | None, error: str | None, extracted_text: str | None,
+                cache: tuple[str, int, int] | None):
+        with SessionLocal() as db:
+            crud.finish_precheck_job(db, job_id, report_json=report_json, error=error, max_attempts=PRECHECK_MAX_ATTEMPTS,
+                                     extracted_text=extracted_text, cache=cache)
+
+precheck_worker = PrecheckWorker()
@@ -1,26 +1,62 @@
-import os, json
+import os, hmac, json, stat, asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, Request, Depends, UploadFile, File, Form, HTTPException
-from fastapi.responses import RedirectResponse, HTMLResponse, FileResponse
+from fastapi import FastAPI, Request, Depends, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi.responses import RedirectResponse, HTMLResponse, StreamingResponse, Response, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
 from sqlalchemy.orm import Session
-from .database import Base, engine, get_db
-from . import models, crud
+from .database import Base, SessionLocal, engine, get_db
+from . import models, crud, schemas, search, passwords, metrics
 from .deps import require_role, require_login
-from .ai_precheck import analyze_file
-from .notifications import notify_teacher_of_upload
-from .reports import build_student_report
+from .jobs import precheck_worker
+from .fragments import fragment_cache
+from .pubsub import broker
+from . import notifications
+from .reports import build_student_report, report_rows, report_stats, report_version, report_cache, stream_reports_zip, shutdown_render_pool, ReportRow
+from .storage import save_upload, save_uploads, body_limit, UploadLimitMiddleware, MAX_BATCH_FILES
+from .files import serve_file
 
 Base.metadata.create_all(bind=engine)
+search.install(engine)
+metrics.instrument_engine(engine)
+with SessionLocal() as _db:
+    crud.ensure_student_summaries(_db)
+    crud.ensure_precheck_cache_size(_db)
 
-app = FastAPI(title="Educational Portfolio App - Phase 1")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    precheck_worker.start()
+    yield
+    await precheck_worker.stop()
+    shutdown_render_pool()
+    passwords.shutdown()
+
+SSE_KEEPALIVE_SECONDS = 15
+
+app = FastAPI(title="Educational Portfolio App - Phase 1", lifespan=lifespan)
+
+# Jinja2 (compiled templates are cached on disk, so new workers skip recompiling)
+TEMPLATE_CACHE_DIR = os.environ.get("TEMPLATE_CACHE_DIR")  # default: Jinja's per-user, 0700 directory in the temp dir
+
+def _bytecode_cache(directory: str | None) -> FileSystemBytecodeCache:
+    # Cached bytecode is unmarshalled and executed, so only trust a private directory we own
+    if directory is None:
+        return FileSystemBytecodeCache()
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(f"TEMPLATE_CACHE_DIR {directory} must be a directory owned by this user with mode 0700")
+    return FileSystemBytecodeCache(directory)
 
-# Jinja2
 templates_env = Environment(
     loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), "templates")),
     autoescape=select_autoescape(["html", "xml"]),
+    bytecode_cache=_bytecode_cache(TEMPLATE_CACHE_DIR),
+    auto_reload=os.environ.get("TEMPLATES_AUTO_RELOAD", "1") == "1",
 )
 app.state.templates = templates_env
 
@@ -30,6 +66,26 @@ app.mount("/static", StaticFiles(directory=os.path.join(os.path.dirname(__file__
 # Sessions
 app.add_middleware(SessionMiddleware, secret_key=os.environ.get("SESSION_SECRET", "dev-secret-change-me"), same_site="lax")
 
+# Oversized uploads are refused before the multipart parser spools them (material kind is only known after parsing)
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/student/upload": body_limit("assignment"),
+    "/student/upload/batch": body_limit("assignment", MAX_BATCH_FILES),
+    "/teacher/materials/upload": max(body_limit(t.value) for t in models.MaterialType),
+})
+
+# Request/query instrumentation (outermost, so it times everything below it)
+app.add_middleware(metrics.MetricsMiddleware)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")  # if set, scrapers may send "Authorization: Bearer <token>"
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint(request: Request):
+    # fail closed: a teacher session or the configured token, never anonymous
+    user = request.session.get("user")
+    has_token = bool(METRICS_TOKEN) and hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}")
+    if not has_token and (not user or user.get("role") != "teacher"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # Routers
 from .auth import router as auth_router
 app.include_router(auth_router)
@@ -37,6 +93,25 @@ app.include_router(auth_router)
 def render(request: Request, template: str, ctx: dict):
     return app.state.templates.get_template(template).render(ctx | {"request": request})
 
+STREAM_CHUNK_CHARS = 64 * 1024
+
+def _chunked(parts, size: int = STREAM_CHUNK_CHARS):
+    # Starlette pulls every item of a sync iterator through the threadpool, so hand it
+    # ~64K pieces rather than each small string Jinja yields
+    buf, n = [], 0
+    for part in parts:
+        buf.append(part)
+        n += len(part)
+        if n >= size:
+            yield "".join(buf)
+            buf, n = [], 0
+    if buf:
+        yield "".join(buf)
+
+def render_stream(request: Request, template: str, ctx: dict) -> StreamingResponse:
+    """Stream a long page in STREAM_CHUNK_CHARS pieces instead of building one large string."""
+    return StreamingResponse(_chunked(app.state.templates.get_template(template).generate(ctx | {"request": request})), media_type="text/html")
+
 # Index -> redirect
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request):
@@ -48,11 +123,20 @@ def index(request: Request):
 # ---------------- Student Area ----------------
 @app.get("/student/dashboard", response_class=HTMLResponse)
 @require_role("student")
-async def student_dashboard(request: Request, db: Session = Depends(get_db), q: str | None = None, status: str | None = None):
+def student_dashboard(request: Request, db: Session = Depends(get_db), q: str | None = None, status: str | None = None):
     user = request.session["user"]
-    assignments = crud.list_student_assignments(db, user["id"], q=q, status=status)
-    html = render(request, "student_dashboard.html", {"user": user, "assignments": assignments, "q": q or "", "status": status or ""})
-    return HTMLResponse(html)
+
+    def assignments_table():
+        assignments = crud.list_student_assignments(db, user["id"], q=q, status=status)
+        return render(request, "_student_assignments.html", {"assignments": assignments})
+
+    if q or status:
+        assignments_html = Markup(assignments_table())
+    else:
+        assignments_html = fragment_cache.get_or_render(db, f"student_assignments:{user['id']}", [f"student:{user['id']}"], assignments_table)
+    summary = crud.get_student_summary(db, user["id"])
+    return HTMLResponse(render(request, "student_dashboard.html", {"user": user, "assignments_html": assignments_html, "q": q or "", "status": status or "",
+                                                                   "summary": crud.summary_dict(summary)}))
 
 @app.get("/student/upload", response_class=HTMLResponse)
 @require_role("student")
@@ -62,41 +146,129 @@ async def student_upload_page(request: Request):
 
 @app.post("/student/upload")
 @require_role("student")
-async def student_upload(request: Request, file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def student_upload(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...), db: Session = Depends(get_db)):
     user = request.session["user"]
-    uploads_dir = os.path.join(os.path.dirname(__file__), "uploads")
-    os.makedirs(uploads_dir, exist_ok=True)
-    stored_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-    path = os.path.join(uploads_dir, stored_name)
-    with open(path, "wb") as f:
-        f.write(await file.read())
+    with metrics.stage("upload"):
+        stored = await save_upload(file, "assignment")
 
-    assignment = crud.create_assignment(db, student_id=user["id"], stored_filename=stored_name, original_name=file.filename)
-
-    # AI pre-check (teacher only)
-    report = analyze_file(path)
-    crud.save_ai_report(db, assignment.id, json.dumps(report))
+    # AI pre-check (teacher only) runs in the background worker
+    await run_in_threadpool(crud.create_assignment, db, student_id=user["id"], stored_filename=stored.name, original_name=file.filename,
+                            precheck_path=stored.path, content_hash=stored.sha256, size=stored.size)
+    precheck_worker.wake()
 
     # Notify all teachers (simple broadcast to all teacher users)
-    teachers = db.query(models.User).filter(models.User.role == models.RoleEnum.teacher).all()
-    notify_teacher_of_upload(db, [t.id for t in teachers], user["email"], file.filename)
+    if notifications.NOTIFY_MODE == "deferred":
+        background_tasks.add_task(notifications.notify_teachers_of_upload, user["email"], file.filename)
+    else:
+        await run_in_threadpool(notifications.notify_teachers_of_upload, user["email"], file.filename)
+
+    return RedirectResponse(url="/student/dashboard", status_code=303)
+
+@app.post("/student/upload/batch")
+@require_role("student")
+async def student_upload_batch(request: Request, background_tasks: BackgroundTasks, files: list[UploadFile] = File(...), db: Session = Depends(get_db)):
+    """Several assignments at once: files are stored concurrently and inserted in one transaction."""
+    user = request.session["user"]
+    with metrics.stage("upload_batch"):
+        stored = await save_uploads(files, "assignment")
+
+    uploads = [{"stored_filename": s.name, "original_name": f.filename, "precheck_path": s.path, "content_hash": s.sha256, "size": s.size}
+               for f, s in zip(files, stored)]
+    await run_in_threadpool(crud.create_assignments, db, user["id"], uploads)
+    precheck_worker.wake()
+
+    names = [f.filename for f in files]
+    if notifications.NOTIFY_MODE == "deferred":
+        background_tasks.add_task(notifications.notify_teachers_of_upload, user["email"], names)
+    else:
+        await run_in_threadpool(notifications.notify_teachers_of_upload, user["email"], names)
 
     return RedirectResponse(url="/student/dashboard", status_code=303)
 
 # ---------------- Teacher Area ----------------
 @app.get("/teacher/dashboard", response_class=HTMLResponse)
 @require_role("teacher")
-async def teacher_dashboard(request: Request, db: Session = Depends(get_db)):
+def teacher_dashboard(request: Request, db: Session = Depends(get_db), cursor: str | None = None, limit: int | None = None):
     user = request.session["user"]
-    assignments = crud.list_all_assignments(db)
-    materials = crud.list_materials(db, teacher_id=user["id"])
+    limit = crud.clamp_page_size(limit)
+
+    def assignments_table():
+        assignments, next_cursor = crud.list_assignments_page(db, cursor=cursor, limit=limit)
+        return render(request, "_teacher_assignments.html", {"assignments": assignments, "cursor": cursor, "next_cursor": next_cursor, "limit": limit})
+
+    def materials_list():
+        return render(request, "_materials.html", {"materials": crud.list_materials(db, teacher_id=user["id"])})
+
+    assignments_html = fragment_cache.get_or_render(db, f"teacher_assignments:{cursor}:{limit}", ["assignments"], assignments_table)
+    materials_html = fragment_cache.get_or_render(db, f"materials:{user['id']}", [f"materials:{user['id']}"], materials_list)
     notifications = crud.list_notifications(db, user_id=user["id"])
-    html = render(request, "teacher_dashboard.html", {"user": user, "assignments": assignments, "materials": materials, "notifications": notifications})
-    return HTMLResponse(html)
+    return HTMLResponse(render(request, "teacher_dashboard.html", {"user": user, "notifications": notifications, "summary": crud.class_summary(db),
+                                                                   "assignments_html": assignments_html, "materials_html": materials_html}))
+
+# Materialized assignment stats (see models.StudentSummary)
+@app.get("/teacher/summary", response_model=schemas.ClassOverview)
+@require_role("teacher")
+def teacher_summary(request: Request, db: Session = Depends(get_db)):
+    summaries = crud.student_summaries(db)
+    students = [{"student_id": sid, "email": email} | crud.summary_dict(summaries.get(sid))
+                for sid, email in crud.list_students(db)]
+    return {"summary": crud.class_summary(db), "students": students}
+
+@app.get("/teacher/summary/{student_id}", response_model=schemas.StudentSummaryOut)
+@require_role("teacher")
+def teacher_student_summary(request: Request, student_id: int, db: Session = Depends(get_db)):
+    student = db.get(models.User, student_id)
+    if not student or student.role != models.RoleEnum.student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    summary = crud.get_student_summary(db, student_id)
+    return {"student_id": student_id, "email": student.email} | crud.summary_dict(summary)
+
+@app.get("/student/summary", response_model=schemas.StudentSummaryOut)
+@require_role("student")
+def student_summary(request: Request, db: Session = Depends(get_db)):
+    user = request.session["user"]
+    summary = crud.get_student_summary(db, user["id"])
+    return {"student_id": user["id"], "email": user["email"]} | crud.summary_dict(summary)
+
+# Notifications: JSON pages, unread count and a server-sent events push channel
+@app.get("/teacher/notifications", response_model=schemas.NotificationPage)
+@require_role("teacher")
+def teacher_notifications(request: Request, before_id: int | None = None, limit: int | None = None, db: Session = Depends(get_db)):
+    items = crud.list_notifications(db, request.session["user"]["id"], before_id=before_id, limit=limit)
+    next_before_id = items[-1].id if len(items) == crud.clamp_page_size(limit) else None
+    return {"items": items, "next_before_id": next_before_id}
+
+@app.get("/teacher/notifications/unread", response_model=schemas.UnreadCount)
+@require_role("teacher")
+def teacher_unread_count(request: Request, db: Session = Depends(get_db)):
+    return {"unread": crud.count_unread_notifications(db, request.session["user"]["id"])}
+
+@app.post("/teacher/notifications/read")
+@require_role("teacher")
+def teacher_mark_read(request: Request, db: Session = Depends(get_db)):
+    crud.mark_notifications_read(db, request.session["user"]["id"])
+    return RedirectResponse(url="/teacher/dashboard", status_code=303)
+
+@app.get("/teacher/notifications/stream")
+@require_role("teacher")
+async def teacher_notification_stream(request: Request):
+    user_id = request.session["user"]["id"]
+
+    async def events():
+        async with broker.subscribe(user_id) as queue:
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/teacher/assignment/{assignment_id}", response_class=HTMLResponse)
 @require_role("teacher")
-async def teacher_view_assignment(request: Request, assignment_id: int, db: Session = Depends(get_db)):
+def teacher_view_assignment(request: Request, assignment_id: int, db: Session = Depends(get_db)):
     a = db.query(models.Assignment).get(assignment_id)
     if not a:
         raise HTTPException(status_code=404, detail="Assignment not found")
@@ -106,54 +278,86 @@ async def teacher_view_assignment(request: Request, assignment_id: int, db: Sess
 
 @app.post("/teacher/assignment/{assignment_id}/feedback")
 @require_role("teacher")
-async def teacher_feedback(request: Request, assignment_id: int, feedback: str = Form(""), status: str = Form("reviewed"), db: Session = Depends(get_db)):
+def teacher_feedback(request: Request, assignment_id: int, feedback: str = Form(""), status: str = Form("reviewed"), db: Session = Depends(get_db)):
     status_enum = models.AssignmentStatus(status)
     crud.save_feedback(db, assignment_id, feedback, status_enum)
     return RedirectResponse(url=f"/teacher/assignment/{assignment_id}", status_code=303)
 
+@app.post("/teacher/assignments/feedback", response_model=schemas.FeedbackBatchResult)
+@require_role("teacher")
+def teacher_feedback_batch(request: Request, batch: schemas.FeedbackBatch, db: Session = Depends(get_db)):
+    """Grade many assignments in one request (a single UPDATE); unknown ids come back in `missing`."""
+    items = [(item.assignment_id, item.feedback) for item in batch.items]
+    updated = crud.save_feedback_batch(db, items, batch.status)
+    return {"updated": updated, "missing": sorted({aid for aid, _ in items} - set(updated))}
+
 @app.get("/uploads/{filename}")
 @require_login
-async def get_upload(filename: str):
-    path = os.path.join(os.path.dirname(__file__), "uploads", filename)
-    return FileResponse(path)
+def get_upload(request: Request, filename: str):
+    return serve_file(request, filename, os.path.join(os.path.dirname(__file__), "uploads"))
 
 # Materials
 @app.post("/teacher/materials/upload")
 @require_role("teacher")
 async def upload_material(request: Request, title: str = Form(...), type: str = Form("document"), file: UploadFile = File(...), db: Session = Depends(get_db)):
     user = request.session["user"]
-    mat_dir = os.path.join(os.path.dirname(__file__), "materials")
-    os.makedirs(mat_dir, exist_ok=True)
-    stored_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-    path = os.path.join(mat_dir, stored_name)
-    with open(path, "wb") as f:
-        f.write(await file.read())
-    crud.create_material(db, teacher_id=user["id"], title=title, type_=models.MaterialType(type), path=stored_name)
+    type_enum = models.MaterialType(type)
+    with metrics.stage("material_upload"):
+        stored = await save_upload(file, type_enum.value)
+    await run_in_threadpool(crud.create_material, db, teacher_id=user["id"], title=title, type_=type_enum, path=stored.name,
+                            content_hash=stored.sha256, size=stored.size)
     return RedirectResponse(url="/teacher/dashboard", status_code=303)
 
 @app.get("/materials/{filename}")
 @require_login
-async def get_material(filename: str):
-    path = os.path.join(os.path.dirname(__file__), "materials", filename)
-    return FileResponse(path)
+def get_material(request: Request, filename: str):
+    return serve_file(request, filename, os.path.join(os.path.dirname(__file__), "materials"))
 
 # Parent report (PDF)
 @app.get("/teacher/report/{student_id}")
 @require_role("teacher")
-async def student_report(request: Request, student_id: int, db: Session = Depends(get_db)):
-    student = db.query(models.User).get(student_id)
+def student_report(request: Request, student_id: int, db: Session = Depends(get_db)):
+    # sync route: queries and ReportLab rendering run in the threadpool, not on the event loop
+    student = db.get(models.User, student_id)
     if not student or student.role != models.RoleEnum.student:
         raise HTTPException(status_code=404, detail="Student not found")
-    assignments = crud.list_student_assignments(db, student_id=student_id)
-    status_counts = {"total": len(assignments), "submitted": 0, "reviewed": 0, "returned": 0}
-    for a in assignments:
-        status_counts[a.status.value] += 1
-    pdf_bytes = build_student_report(student.email, assignments, status_counts)
-    fname = f"report_{student_id}.pdf"
-    fpath = os.path.join(os.path.dirname(__file__), fname)
-    with open(fpath, "wb") as f:
-        f.write(pdf_bytes)
-    return FileResponse(fpath, media_type="application/pdf", filename=fname)
+    status_counts, last_change = _report_stats(crud.get_student_summary(db, student_id))
+    version = report_version(status_counts, last_change)
+    etag = f'"{student_id}-{version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    pdf_bytes = report_cache.get(student_id, version)
+    if pdf_bytes is None:
+        rows = report_rows(crud.list_recent_assignments(db, student_id))
+        with metrics.stage("report"):
+            pdf_bytes = build_student_report(student.email, rows, status_counts)
+        report_cache.put(student_id, version, pdf_bytes)
+    return Response(pdf_bytes, media_type="application/pdf",
+                    headers={"Content-Disposition": f'attachment; filename="report_{student_id}.pdf"', "ETag": etag})
+
+def _report_stats(summary: models.StudentSummary | None) -> tuple[dict, datetime | None]:
+    """Report stats and last change for a student, straight from the materialized summary."""
+    return report_stats(crud.summary_dict(summary)), summary.updated_at if summary else None
+
+def _class_report_jobs(db: Session):
+    students = crud.list_students(db)
+    summaries = crud.student_summaries(db)
+    recent = crud.recent_assignments_by_student(db)
+    jobs = []
+    for student_id, email in students:
+        stats, last_change = _report_stats(summaries.get(student_id))
+        rows = [ReportRow(r.id, r.original_name, r.status.value, r.uploaded_at) for r in recent.get(student_id, [])]
+        jobs.append((student_id, email, rows, stats, report_version(stats, last_change)))
+    return jobs
+
+# Bulk export: every student's report in one streamed ZIP
+@app.get("/teacher/reports/export.zip")
+@require_role("teacher")
+async def export_reports(request: Request, db: Session = Depends(get_db)):
+    jobs = await run_in_threadpool(_class_report_jobs, db)
+    stamp = datetime.utcnow().strftime("%Y%m%d")
+    return StreamingResponse(stream_reports_zip(jobs), media_type="application/zip",
+                             headers={"Content-Disposition": f'attachment; filename="reports_{stamp}.zip"'})
 
 # ---------------- Templates rendering helpers ----------------
 from fastapi import APIRouter
@@ -161,8 +365,7 @@ pages = APIRouter()
 
 @app.get("/portfolio", response_class=HTMLResponse)
 @require_role("student")
-async def portfolio_page(request: Request, db: Session = Depends(get_db)):
+def portfolio_page(request: Request, db: Session = Depends(get_db)):
     user = request.session["user"]
     assignments = crud.list_student_assignments(db, user["id"])
-    html = render(request, "portfolio.html", {"user": user, "assignments": assignments})
-    return HTMLResponse(html)
+    return render_stream(request, "portfolio.html", {"user": user, "assignments": assignments})
@@ -0,0 +1,173 @@
+import os, time, logging, threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+# Latency buckets in seconds (upper bounds), Prometheus-style
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))  # 0 disables the slow-request log
+
+REGISTRY: list = []
+
+def _quote(value) -> str:
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f"{n}={_quote(v)}" for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *labelvalues, n: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + n
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for lv, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, lv)} {v}")
+        return lines
+
+class _Series:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self, n: int):
+        self.counts = [0] * n  # per bucket, not cumulative
+        self.count = 0
+        self.sum = 0.0
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, _Series] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labelvalues):
+        with self._lock:
+            s = self._series.get(labelvalues)
+            if s is None:
+                s = self._series[labelvalues] = _Series(len(self.buckets))
+            s.count += 1
+            s.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    s.counts[i] += 1
+                    break
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for lv, s in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, s.counts):
+                    cumulative += n
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, lv, 'le=' + _quote(bound))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, lv, 'le=' + _quote('+Inf'))} {s.count}")
+                labels = _labels(self.labelnames, lv)
+                lines.append(f"{self.name}_sum{labels} {s.sum}")
+                lines.append(f"{self.name}_count{labels} {s.count}")
+        return lines
+
+def render_prometheus() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+# ---------------- request / query / stage instrumentation ----------------
+http_requests = Histogram("http_request_duration_seconds", "Request latency by route", ("method", "route", "status"))
+http_request_queries = Histogram("http_request_db_queries", "SQL statements per request", ("route",), buckets=COUNT_BUCKETS)
+http_request_query_time = Histogram("http_request_db_seconds", "Time spent in SQL per request", ("route",))
+db_queries = Counter("db_queries_total", "SQL statements executed")
+stage_duration = Histogram("stage_duration_seconds", "Time spent in named pipeline stages", ("stage",))
+precheck_cache_hits = Counter("precheck_cache_hits_total", "Pre-check jobs answered from the result cache")
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds", "closed")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.closed = False  # set once the response is sent; background tasks after that are not the request's
+
+# Mutable per-request holder; the threadpool copies the context, so sync handlers update the same object
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+@contextmanager
+def stage(name: str):
+    """Time a block of work, e.g. `with metrics.stage("upload"): ...`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(time.perf_counter() - started, name)
+
+def instrument_engine(engine: Engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_queries.inc()
+        stats = _request_stats.get()
+        if stats is not None and not stats.closed:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (keeps streaming responses and contextvars intact)
+    recording latency, SQL count and SQL time per route, plus an optional slow log.
+    A request ends when its last body chunk is sent: Starlette runs BackgroundTasks
+    inside the app call after that, and their time and queries are not the request's."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = [500]
+        started = time.perf_counter()
+
+        def record():
+            if stats.closed:
+                return
+            stats.closed = True
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            http_requests.observe(elapsed, scope["method"], route, status[0])
+            http_request_queries.observe(stats.queries, route)
+            http_request_query_time.observe(stats.query_seconds, route)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                log.warning("slow request %s %s -> %s in %.1f ms (%d queries, %.1f ms SQL)", scope["method"], scope["path"],
+                            status[0], elapsed * 1000, stats.queries, stats.query_seconds * 1000)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()  # no-op unless the app failed before finishing the response
+            _request_stats.reset(token)
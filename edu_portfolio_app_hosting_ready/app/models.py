@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Text, Enum, Boolean, Index, Float
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from datetime import datetime
 from .database import Base
@@ -24,16 +24,31 @@ class AssignmentStatus(str, enum.Enum):
     reviewed = "reviewed"
     returned = "returned"
 
+class PrecheckStatus(str, enum.Enum):
+    pending = "pending"
+    done = "done"
+    failed = "failed"
+
 class Assignment(Base):
     __tablename__ = "assignments"
+    __table_args__ = (
+        Index("ix_assignments_uploaded_at_id", "uploaded_at", "id"),  # teacher dashboard keyset pagination
+        Index("ix_assignments_student_uploaded", "student_id", "uploaded_at"),  # student history
+        Index("ix_assignments_student_status_uploaded", "student_id", "status", "uploaded_at"),  # status filter
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     student_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     filename: Mapped[str] = mapped_column(String, nullable=False)
     original_name: Mapped[str] = mapped_column(String, nullable=False)
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)  # sha256 hex
+    size: Mapped[int | None] = mapped_column(Integer, nullable=True)
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     ai_report: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON string; visible to teacher
     teacher_feedback: Mapped[str | None] = mapped_column(Text, nullable=True)
+    extracted_text: Mapped[str | None] = mapped_column(Text, nullable=True)  # filled by pre-check; full-text indexed
     status: Mapped[AssignmentStatus] = mapped_column(Enum(AssignmentStatus), default=AssignmentStatus.submitted)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    precheck_status: Mapped[PrecheckStatus] = mapped_column(Enum(PrecheckStatus), default=PrecheckStatus.pending)
 
     student = relationship("User", back_populates="assignments", foreign_keys=[student_id])
 
@@ -50,14 +65,97 @@ class Material(Base):
     title: Mapped[str] = mapped_column(String, nullable=False)
     type: Mapped[MaterialType] = mapped_column(Enum(MaterialType), default=MaterialType.document)
     path: Mapped[str] = mapped_column(String, nullable=False)  # file path or URL
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)  # sha256 hex
+    size: Mapped[int | None] = mapped_column(Integer, nullable=True)
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     teacher = relationship("User", back_populates="materials", foreign_keys=[teacher_id])
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),  # unread counts
+        Index("ix_notifications_user_id_id", "user_id", "id"),  # per-user keyset pagination
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     message: Mapped[str] = mapped_column(String, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     is_read: Mapped[bool] = mapped_column(Boolean, default=False)
+
+class JobState(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+class PrecheckJob(Base):
+    __tablename__ = "precheck_jobs"
+    __table_args__ = (
+        Index("ix_precheck_jobs_state_id", "state", "id"),  # worker claims oldest queued first
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    assignment_id: Mapped[int] = mapped_column(ForeignKey("assignments.id"))
+    path: Mapped[str] = mapped_column(String, nullable=False)  # file to analyze
+    state: Mapped[JobState] = mapped_column(Enum(JobState), default=JobState.queued)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    assignment = relationship("Assignment")
+
+class Blob(Base):
+    """Content-addressed file in the blob store (see storage.py), shared by every
+    Assignment/Material with the same bytes."""
+    __tablename__ = "blobs"
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    refcount: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class PrecheckResult(Base):
+    """Memoized analyzer output for a blob, reused by identical uploads."""
+    __tablename__ = "precheck_results"
+    __table_args__ = (
+        Index("ix_precheck_results_last_used", "last_used_at"),  # LRU eviction
+    )
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    analyzer: Mapped[str] = mapped_column(String, primary_key=True)
+    analyzer_version: Mapped[int] = mapped_column(Integer, nullable=False)
+    report: Mapped[str] = mapped_column(Text, nullable=False)  # JSON
+    extracted_text: Mapped[str | None] = mapped_column(Text, nullable=True)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)  # bytes of report + extracted_text, for eviction
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class PrecheckCacheSize(Base):
+    """Single row (id 1) holding the sum of precheck_results.size, kept up to date by
+    the crud functions that store and delete results so eviction never scans the table."""
+    __tablename__ = "precheck_cache_size"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    total_bytes: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+
+class CacheVersion(Base):
+    """Version counter per fragment-cache key, bumped in the same transaction as the data it covers."""
+    __tablename__ = "cache_versions"
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+class StudentSummary(Base):
+    """Materialized per-student assignment stats, updated by the crud functions that
+    change assignments so dashboards and reports never scan the history."""
+    __tablename__ = "student_summaries"
+    student_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    submitted: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # one counter per AssignmentStatus
+    reviewed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    returned: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_upload_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    prechecked: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    precheck_failed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    stats_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # reports with text stats; divides the sums
+    tokens_sum: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    long_words_sum: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    letters_ratio_sum: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)  # any change to the student's assignments
@@ -1,6 +1,27 @@
+import os
+from datetime import datetime
 from sqlalchemy.orm import Session
-from . import crud
+from .database import SessionLocal
+from .pubsub import broker
+from . import crud, metrics
 
-def notify_teacher_of_upload(db: Session, teacher_ids: list[int], student_email: str, assignment_name: str):
-    for tid in teacher_ids:
-        crud.add_notification(db, tid, f"New assignment from {student_email}: {assignment_name}")
+# "deferred" sends notifications after the response via BackgroundTasks; "inline" before it
+NOTIFY_MODE = os.environ.get("NOTIFY_MODE", "deferred")
+
+def upload_message(student_email: str, assignment_name: str) -> str:
+    return f"New assignment from {student_email}: {assignment_name}"
+
+def notify_teacher_of_upload(db: Session, teacher_ids: list[int], student_email: str, assignment_name: str | list[str]):
+    names = [assignment_name] if isinstance(assignment_name, str) else assignment_name
+    messages = [upload_message(student_email, name) for name in names]
+    with metrics.stage("notify"):
+        crud.add_notifications(db, teacher_ids, messages)
+    # push to teachers with an open /teacher/notifications/stream
+    created_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M')
+    for message in messages:
+        broker.publish(teacher_ids, {"message": message, "created_at": created_at})
+
+def notify_teachers_of_upload(student_email: str, assignment_name: str | list[str]):
+    """Fan an upload (or a batch of them) out to every teacher with its own session, for use as a background task."""
+    with SessionLocal() as db:
+        notify_teacher_of_upload(db, crud.list_teacher_ids(db), student_email, assignment_name)
@@ -0,0 +1,26 @@
+import os, asyncio
+from concurrent.futures import ProcessPoolExecutor
+from . import crud
+
+# bcrypt is CPU-bound (~250 ms at cost 12); running it in a small process pool keeps
+# both the event loop and FastAPI's threadpool free during login bursts.
+PASSWORD_WORKERS = int(os.environ.get("PASSWORD_WORKERS", os.cpu_count() or 1))
+_pool: ProcessPoolExecutor | None = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+    return _pool
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_get_pool(), crud.hash_password, password)
+
+async def verify_password(hashed_password: str, password: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(_get_pool(), crud.verify_password, hashed_password, password)
@@ -0,0 +1,57 @@
+"""Re-run the pre-check for memoized results whose analyzer version changed.
+
+    python -m app.precheck_backfill [--workers N] [--dry-run]
+
+Only stale cache entries are re-analyzed; every assignment sharing the content
+hash gets the fresh report.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from .database import Base, SessionLocal, engine
+from .ai_precheck import ANALYZERS, analyzer_for
+from .jobs import run_precheck, with_filename, PRECHECK_CACHE_MAX_BYTES
+from .storage import blob_path
+from . import crud, models
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    current = {a.name: a.version for a in ANALYZERS.values()}
+    with SessionLocal() as db:
+        crud.ensure_precheck_cache_size(db)
+        todo = []
+        for content_hash, analyzer in crud.stale_precheck_results(db, current):
+            name = db.query(models.Assignment.original_name).filter(models.Assignment.content_hash == content_hash).limit(1).scalar()
+            if name is None:  # no assignment uses these bytes any more
+                crud.delete_precheck_result(db, content_hash, analyzer)
+                continue
+            todo.append((content_hash, analyzer, name))
+        db.commit()
+        print(f"{len(todo)} stale pre-check results")
+        if args.dry_run or not todo:
+            return
+
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = pool.map(run_precheck, [blob_path(h) for h, _, _ in todo], [name for _, _, name in todo])
+            for (content_hash, old_analyzer, name), (report_json, extracted) in zip(todo, results):
+                analyzer = analyzer_for(name)
+                if analyzer.name != old_analyzer:
+                    crud.delete_precheck_result(db, content_hash, old_analyzer)
+                crud.store_precheck_result(db, content_hash, analyzer.name, analyzer.version, report_json, extracted,
+                                           PRECHECK_CACHE_MAX_BYTES, commit=False)
+                student_ids = set()
+                for a in db.query(models.Assignment).filter(models.Assignment.content_hash == content_hash):
+                    a.ai_report = with_filename(report_json, a.original_name)
+                    a.extracted_text = extracted
+                    student_ids.add(a.student_id)
+                db.flush()
+                crud.refresh_student_summaries(db, sorted(student_ids))  # pre-check averages changed
+                db.commit()
+                print(f"re-analyzed {content_hash[:12]} ({name}) with {analyzer.name} v{analyzer.version}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import asyncio, threading
+from contextlib import asynccontextmanager
+
+QUEUE_SIZE = 100
+
+class Broker:
+    """In-process pub/sub keyed by user id. publish() is safe to call from any thread
+    (sync handlers and background tasks run in the threadpool); each subscriber gets a
+    bounded queue and slow consumers drop messages rather than grow memory.
+    Only reaches subscribers connected to this process.
+    """
+
+    def __init__(self):
+        self._subs: dict[int, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()  # subscribe runs on the event loop, publish on threadpool threads
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+        with self._lock:
+            self._subs.setdefault(user_id, set()).add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                subs = self._subs.get(user_id, set())
+                subs.discard(entry)
+                if not subs:
+                    self._subs.pop(user_id, None)
+
+    def publish(self, user_ids, payload: dict):
+        with self._lock:
+            targets = [entry for uid in user_ids for entry in self._subs.get(uid, ())]
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, payload)
+            except RuntimeError:  # loop closed since it subscribed
+                pass
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, payload: dict):
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            pass
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subs.values())
+
+broker = Broker()
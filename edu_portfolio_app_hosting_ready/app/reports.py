@@ -1,7 +1,16 @@
-import io
+import io, os, re, zipfile, asyncio, hashlib, threading
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict, namedtuple
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
+from . import metrics
+
+# Plain, picklable stand-in for an Assignment row
+ReportRow = namedtuple("ReportRow", "id original_name status uploaded_at")
+
+def report_rows(assignments) -> list[ReportRow]:
+    return [ReportRow(a.id, a.original_name, a.status.value, a.uploaded_at) for a in assignments]
 
 def build_student_report(student_email: str, assignments: list, stats: dict) -> bytes:
     """Create a very simple PDF with student progress summary."""
@@ -18,6 +27,9 @@ def build_student_report(student_email: str, assignments: list, stats: dict) ->
     c.drawString(2*cm, y, f"Total Assignments: {stats.get('total', 0)}")
     y -= 0.6*cm
     c.drawString(2*cm, y, f"Reviewed: {stats.get('reviewed', 0)} | Returned: {stats.get('returned', 0)} | Submitted: {stats.get('submitted', 0)}")
+    y -= 0.6*cm
+    if stats.get("avg_tokens") is not None:
+        c.drawString(2*cm, y, f"Pre-check averages: {stats['avg_tokens']} words | {stats['avg_long_words']} long words | letters ratio {stats['avg_letters_ratio']}")
     y -= 1*cm
 
     c.setFont("Helvetica-Bold", 13)
@@ -36,3 +48,106 @@ def build_student_report(student_email: str, assignments: list, stats: dict) ->
     pdf = buffer.getvalue()
     buffer.close()
     return pdf
+
+def report_stats(summary: dict) -> dict:
+    """Flatten a crud.summary_dict into the `stats` build_student_report prints."""
+    return summary["counts"] | {k: v for k, v in summary["precheck"].items() if k.startswith("avg_")}
+
+def report_version(stats: dict, last_change) -> str:
+    """Cache key part that changes whenever any of the student's assignments is added or updated."""
+    raw = f"{sorted(stats.items())}|{last_change.isoformat() if last_change else ''}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+class ReportCache:
+    """LRU of rendered PDFs, one entry per student, valid for a single report_version."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[int, tuple[str, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, student_id: int, version: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if not entry or entry[0] != version:
+                return None
+            self._entries.move_to_end(student_id)
+            return entry[1]
+
+    def put(self, student_id: int, version: str, pdf: bytes):
+        with self._lock:
+            self._entries[student_id] = (version, pdf)  # replaces any stale version
+            self._entries.move_to_end(student_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+report_cache = ReportCache(int(os.environ.get("REPORT_CACHE_SIZE", "256")))
+
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", min(4, os.cpu_count() or 1)))
+_render_pool: ProcessPoolExecutor | None = None
+
+def render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=REPORT_WORKERS)
+    return _render_pool
+
+def shutdown_render_pool():
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+
+class _ZipSink:
+    """Write-only file object for zipfile; bytes are drained by the streaming generator."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data) -> int:
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+def zip_entry_name(student_id: int, email: str) -> str:
+    # emails are not validated at registration, so keep only characters that cannot form a path
+    return f"report_{student_id}_{re.sub(r'[^A-Za-z0-9._-]', '_', email.replace('@', '_at_'))}.pdf"
+
+async def stream_reports_zip(jobs: list[tuple[int, str, list, dict, str]]):
+    """Render (student_id, email, rows, stats, version) jobs on the process pool and
+    yield a ZIP archive as it is built. At most 2 * REPORT_WORKERS PDFs are held in
+    memory at once; cached reports are reused and fresh ones are cached.
+    """
+    loop = asyncio.get_running_loop()
+    pool = render_pool()
+    sink = _ZipSink()
+    window = 2 * REPORT_WORKERS
+
+    def submit(job):
+        student_id, email, rows, stats, version = job
+        cached = report_cache.get(student_id, version)
+        if cached is not None:
+            fut = loop.create_future(); fut.set_result(cached)
+            return fut
+        return loop.run_in_executor(pool, build_student_report, email, rows, stats)
+
+    pending = [submit(job) for job in jobs[:window]]
+    with metrics.stage("report_export"):
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:  # PDFs are already compressed
+            for i, job in enumerate(jobs):
+                pdf = await pending[i]
+                pending[i] = None
+                if i + window < len(jobs):
+                    pending.append(submit(jobs[i + window]))
+                student_id, email, _, _, version = job
+                report_cache.put(student_id, version, pdf)
+                zf.writestr(zip_entry_name(student_id, email), pdf)
+                yield sink.drain()
+        yield sink.drain()  # central directory
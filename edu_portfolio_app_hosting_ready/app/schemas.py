@@ -1,5 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from enum import Enum
+from .models import AssignmentStatus
 
 class Role(str, Enum):
     teacher = "teacher"
@@ -13,3 +15,52 @@ class UserCreate(BaseModel):
 class LoginForm(BaseModel):
     email: EmailStr
     password: str
+
+class NotificationOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    message: str
+    created_at: datetime
+    is_read: bool
+
+class NotificationPage(BaseModel):
+    items: list[NotificationOut]
+    next_before_id: int | None
+
+class UnreadCount(BaseModel):
+    unread: int
+
+class FeedbackItem(BaseModel):
+    assignment_id: int
+    feedback: str | None = None  # None keeps the current feedback
+
+class FeedbackBatch(BaseModel):
+    status: AssignmentStatus = AssignmentStatus.reviewed
+    items: list[FeedbackItem] = Field(min_length=1, max_length=500)
+
+class FeedbackBatchResult(BaseModel):
+    updated: list[int]
+    missing: list[int]
+
+class PrecheckSummary(BaseModel):
+    done: int
+    failed: int
+    avg_tokens: float | None
+    avg_long_words: float | None
+    avg_letters_ratio: float | None
+
+class SummaryOut(BaseModel):
+    counts: dict[str, int]  # "total" plus one entry per assignment status
+    last_upload_at: datetime | None
+    precheck: PrecheckSummary
+
+class StudentSummaryOut(SummaryOut):
+    student_id: int
+    email: str
+
+class ClassSummaryOut(SummaryOut):
+    students: int  # students with at least one assignment
+
+class ClassOverview(BaseModel):
+    summary: ClassSummaryOut
+    students: list[StudentSummaryOut]
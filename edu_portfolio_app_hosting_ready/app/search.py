@@ -0,0 +1,76 @@
+import re, logging
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from . import models
+
+log = logging.getLogger(__name__)
+
+# Full-text search over assignments (original name, teacher feedback, extracted text).
+# SQLite: an external-content FTS5 table kept in sync by triggers.
+# Postgres: a generated tsvector column with a GIN index.
+# Either way writes through the ORM or bulk UPDATEs stay indexed with no app code.
+
+_backend: str | None = None  # "fts5", "tsvector" or None (fall back to ILIKE)
+
+_SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS assignments_fts USING fts5(
+        original_name, teacher_feedback, extracted_text, content='assignments', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS assignments_fts_ai AFTER INSERT ON assignments BEGIN
+        INSERT INTO assignments_fts(rowid, original_name, teacher_feedback, extracted_text)
+        VALUES (new.id, new.original_name, new.teacher_feedback, new.extracted_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS assignments_fts_ad AFTER DELETE ON assignments BEGIN
+        INSERT INTO assignments_fts(assignments_fts, rowid, original_name, teacher_feedback, extracted_text)
+        VALUES ('delete', old.id, old.original_name, old.teacher_feedback, old.extracted_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS assignments_fts_au AFTER UPDATE OF original_name, teacher_feedback, extracted_text ON assignments BEGIN
+        INSERT INTO assignments_fts(assignments_fts, rowid, original_name, teacher_feedback, extracted_text)
+        VALUES ('delete', old.id, old.original_name, old.teacher_feedback, old.extracted_text);
+        INSERT INTO assignments_fts(rowid, original_name, teacher_feedback, extracted_text)
+        VALUES (new.id, new.original_name, new.teacher_feedback, new.extracted_text);
+    END""",
+]
+
+_PG_DDL = [
+    """ALTER TABLE assignments ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        to_tsvector('simple', coalesce(original_name, '') || ' ' || coalesce(teacher_feedback, '') || ' ' || coalesce(extracted_text, ''))
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_assignments_search_vector ON assignments USING GIN (search_vector)",
+]
+
+def install(engine: Engine):
+    """Create the search index if missing. Call after Base.metadata.create_all."""
+    global _backend
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                existed = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'assignments_fts'")).first()
+                for ddl in _SQLITE_DDL:
+                    conn.execute(text(ddl))
+                if not existed:  # index rows written before search was installed
+                    conn.execute(text("INSERT INTO assignments_fts(assignments_fts) VALUES ('rebuild')"))
+                _backend = "fts5"
+            elif dialect == "postgresql":
+                for ddl in _PG_DDL:
+                    conn.execute(text(ddl))
+                _backend = "tsvector"
+    except Exception:
+        log.warning("full-text search unavailable on %s; falling back to ILIKE", dialect, exc_info=True)
+        _backend = None
+
+def _fts5_query(q: str) -> str:
+    # quote each word and prefix-match it, so user input can't inject FTS5 syntax
+    return " ".join(f'"{w}"*' for w in re.findall(r"\w+", q))
+
+def match(q: str):
+    """Filter expression for Assignment rows matching the search box text."""
+    A = models.Assignment
+    if _backend == "fts5":
+        fts_q = _fts5_query(q)
+        if not fts_q:
+            return A.original_name.ilike(f"%{q}%")
+        return A.id.in_(text("SELECT rowid FROM assignments_fts WHERE assignments_fts MATCH :fts_q").bindparams(fts_q=fts_q))
+    if _backend == "tsvector":
+        return text("assignments.search_vector @@ plainto_tsquery('simple', :ts_q)").bindparams(ts_q=q)
+    return A.original_name.ilike(f"%{q}%")
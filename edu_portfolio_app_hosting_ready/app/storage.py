@@ -0,0 +1,140 @@
+import os, re, uuid, asyncio, hashlib
+from dataclasses import dataclass
+from fastapi import UploadFile, HTTPException
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from .models import MaterialType
+
+CHUNK_SIZE = 1024 * 1024
+MB = 1024 * 1024
+MAX_BATCH_FILES = int(os.environ.get("MAX_BATCH_FILES", "20"))  # files per multi-file upload
+FORM_OVERHEAD = 64 * 1024  # per file: multipart boundary, part headers and small form fields
+
+APP_DIR = os.path.dirname(__file__)
+BLOB_DIR = os.environ.get("BLOB_DIR", os.path.join(APP_DIR, "blobs"))
+_BLOB_NAME = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]{1,16})?$")
+
+def _cap_mb(name: str, default: int) -> int:
+    return int(os.environ.get(f"MAX_UPLOAD_MB_{name.upper()}", default)) * MB
+
+# Size caps per upload kind; override with MAX_UPLOAD_MB_<KIND>, e.g. MAX_UPLOAD_MB_VIDEO=2048
+SIZE_CAPS = {
+    "assignment": _cap_mb("assignment", 50),
+    MaterialType.document.value: _cap_mb("document", 50),
+    MaterialType.quiz.value: _cap_mb("quiz", 20),
+    MaterialType.game.value: _cap_mb("game", 200),
+    MaterialType.video.value: _cap_mb("video", 1024),
+}
+
+def body_limit(kind: str, files: int = 1) -> int:
+    """Largest request body an upload route for `kind` can legitimately receive."""
+    return files * (SIZE_CAPS[kind] + FORM_OVERHEAD)
+
+class UploadLimitMiddleware:
+    """Pure ASGI middleware capping request bodies per path (`limits`: path -> bytes)
+    before multipart parsing spools them to disk: a Content-Length over the limit gets
+    a 413 without reading the body, and a body that streams past it is cut off with
+    a 413. save_upload still applies the exact per-kind cap to each file."""
+
+    def __init__(self, app, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+        detail = f"Request body exceeds {limit // MB} MB limit"
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            return await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)  # FastAPI re-raises these from body parsing
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+@dataclass
+class StoredFile:
+    name: str     # public name: "<sha256><ext>", stored in Assignment.filename / Material.path
+    path: str     # blob path on disk
+    size: int
+    sha256: str
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], sha256)
+
+def blob_hash(name: str) -> str | None:
+    """sha256 of a content-addressed stored name, None for legacy names."""
+    m = _BLOB_NAME.match(name)
+    return m.group(1) if m else None
+
+def resolve(name: str, legacy_dir: str) -> str | None:
+    """Map a stored filename to a path on disk: content-addressed names go to the
+    blob store, anything else is looked up in the pre-blob-store directory.
+    """
+    m = _BLOB_NAME.match(name)
+    if m:
+        return blob_path(m.group(1))
+    base = os.path.basename(name)
+    return os.path.join(legacy_dir, base) if base == name else None
+
+def _ext(filename: str | None) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,16}", ext) else ""
+
+def _hash(src, max_bytes: int, kind: str) -> tuple[str, int]:
+    h = hashlib.sha256()
+    size = 0
+    src.seek(0)
+    while chunk := src.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"File exceeds {max_bytes // MB} MB limit for {kind}")
+        h.update(chunk)
+    return h.hexdigest(), size
+
+def _copy(src, dst_path: str):
+    src.seek(0)
+    with open(dst_path, "wb") as dst:
+        while chunk := src.read(CHUNK_SIZE):
+            dst.write(chunk)
+
+async def save_upload(file: UploadFile, kind: str) -> StoredFile:
+    """Store an upload in the blob store, deduplicated by sha256.
+    The (already spooled, see UploadLimitMiddleware) upload is hashed in CHUNK_SIZE pieces and checked against
+    the size cap for `kind` (413 otherwise); bytes are only copied to disk when no
+    blob with that hash exists yet. All file work runs in the threadpool.
+    """
+    sha, size = await run_in_threadpool(_hash, file.file, SIZE_CAPS[kind], kind)
+    path = blob_path(sha)
+    if not await run_in_threadpool(os.path.exists, path):
+        await run_in_threadpool(os.makedirs, os.path.dirname(path), exist_ok=True)
+        tmp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.part")
+        try:
+            await run_in_threadpool(_copy, file.file, tmp_path)
+            await run_in_threadpool(os.replace, tmp_path, path)  # atomic; concurrent identical uploads are harmless
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return StoredFile(name=f"{sha}{_ext(file.filename)}", path=path, size=size, sha256=sha)
+
+async def save_uploads(files: list[UploadFile], kind: str) -> list[StoredFile]:
+    """Store several uploads concurrently (see save_upload) and raise the first error,
+    if any. Blobs already written are kept: a concurrent upload of the same bytes may
+    reference them by now, and an unreferenced blob is harmless."""
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} files per upload")
+    results = await asyncio.gather(*(save_upload(f, kind) for f in files), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        raise errors[0]
+    return results
@@ -0,0 +1,229 @@
+"""Benchmark the hot endpoints in-process (httpx -> ASGI app, no server, no network).
+
+    python -m bench.run                       # compare against bench/baseline.json, exit 1 on regression
+    python -m bench.run --save-baseline       # record a new baseline on the reference machine
+    python -m bench.run --students 200 --assignments 20000 --requests 100   # quick run
+
+The seeded database is cached in --data-dir per volume settings and copied for
+every run, so uploads from one run never leak into the next.
+"""
+import os, sys, io, json, time, random, shutil, asyncio, argparse, resource, statistics, tempfile
+
+BENCH_DIR = os.path.dirname(__file__)
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+SCENARIOS = ("student_upload", "student_dashboard", "teacher_dashboard", "teacher_report")
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--students", type=int, default=2000)
+    p.add_argument("--teachers", type=int, default=20)
+    p.add_argument("--assignments", type=int, default=200_000)
+    p.add_argument("--notifications", type=int, default=200_000)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--concurrency", type=int, default=int(os.environ.get("BENCH_CONCURRENCY", "16")))
+    p.add_argument("--requests", type=int, default=int(os.environ.get("BENCH_REQUESTS", "500")), help="measured requests per scenario")
+    p.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    p.add_argument("--clients", type=int, default=50, help="logged-in student sessions to spread requests over")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS))
+    p.add_argument("--data-dir", default=os.environ.get("BENCH_DATA_DIR", os.path.join(tempfile.gettempdir(), "edu-portfolio-bench")))
+    p.add_argument("--baseline", default=DEFAULT_BASELINE)
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--tolerance", type=float, default=float(os.environ.get("BENCH_TOLERANCE", "0.25")),
+                   help="allowed relative slowdown before a metric counts as a regression")
+    p.add_argument("--output", help="also write the results JSON here")
+    return p.parse_args(argv)
+
+def _rss_mb(who) -> float:
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)  # KB on Linux
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    idx = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+def prepare_database(args, run_db: str):
+    """Seed once per volume settings, then copy the seeded file to `run_db`."""
+    from . import seed
+    os.makedirs(args.data_dir, exist_ok=True)
+    key = f"s{args.students}-t{args.teachers}-a{args.assignments}-n{args.notifications}-r{args.seed}"
+    template = os.path.join(args.data_dir, f"seed-{key}.db")
+    if not os.path.exists(template):
+        print(f"seeding {template} ...", flush=True)
+        started = time.perf_counter()
+        seed.seed(template + ".part", args.students, args.teachers, args.assignments, args.notifications, args.seed)
+        os.replace(template + ".part", template)
+        print(f"seeded in {time.perf_counter() - started:.1f}s", flush=True)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(run_db + suffix):
+            os.remove(run_db + suffix)
+    shutil.copyfile(template, run_db)
+
+async def _login(client, email: str):
+    from .seed import BENCH_PASSWORD
+    r = await client.post("/login", data={"email": email, "password": BENCH_PASSWORD})
+    if r.status_code != 303:
+        raise RuntimeError(f"login failed for {email}: {r.status_code}")
+
+async def _measure(request, args) -> dict:
+    """Run `request(i)` args.warmup times one by one, then args.requests times with
+    args.concurrency in flight; `request` returns an error string or None."""
+    for i in range(args.warmup):
+        await request(i)
+    latencies: list[float] = []
+    errors: list[str] = []
+    counter = iter(range(args.warmup, args.warmup + args.requests))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            error = await request(i)
+            latencies.append(time.perf_counter() - started)
+            if error:
+                errors.append(error)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "rps": round(len(latencies) / wall, 1),
+    }
+
+async def run(args) -> dict:
+    import httpx
+    from app.main import app
+    from .seed import student_email, teacher_email
+
+    rnd = random.Random(args.seed)
+    student_ids = list(range(args.teachers + 1, args.teachers + args.students + 1))
+    transport = httpx.ASGITransport(app=app)
+
+    def client():
+        return httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+    def expect(r, status: int) -> str | None:
+        return None if r.status_code == status else f"{r.request.method} {r.request.url.path} -> {r.status_code}"
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        teacher = client()
+        await _login(teacher, teacher_email(0))
+        students = [client() for _ in range(min(args.clients, args.students))]
+        for i, c in enumerate(students):
+            await _login(c, student_email(i))
+
+        async def student_upload(i):
+            body = f"Benchmark essay {i} {rnd.random()}\n".encode() + b"Photosynthesis converts light energy into chemical energy. " * 60
+            r = await students[i % len(students)].post("/student/upload", files={"file": (f"bench_{i}.txt", io.BytesIO(body), "text/plain")})
+            return expect(r, 303)
+
+        async def student_dashboard(i):
+            return expect(await students[i % len(students)].get("/student/dashboard"), 200)
+
+        async def teacher_dashboard(i):
+            return expect(await teacher.get("/teacher/dashboard"), 200)
+
+        async def teacher_report(i):
+            return expect(await teacher.get(f"/teacher/report/{rnd.choice(student_ids)}"), 200)
+
+        scenarios = {f.__name__: f for f in (student_upload, student_dashboard, teacher_dashboard, teacher_report)}
+        for name in args.scenarios.split(","):
+            print(f"running {name} ...", flush=True)
+            results[name] = await _measure(scenarios[name], args)
+        for c in [teacher, *students]:
+            await c.aclose()
+    # ru_maxrss is the high-water mark over the process lifetime, so it is reported for the run, not per scenario
+    results["_process"] = {"peak_rss_mb": _rss_mb(resource.RUSAGE_SELF), "children_peak_rss_mb": _rss_mb(resource.RUSAGE_CHILDREN)}
+    return results
+
+def _settings(args) -> dict:
+    return {k: getattr(args, k) for k in ("students", "teachers", "assignments", "notifications", "seed", "concurrency", "requests", "warmup", "clients", "scenarios")}
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of `results` against `baseline`; latency and the process peak RSS
+    may grow and throughput may drop by at most `tolerance` (relative)."""
+    problems = []
+    base_rss, cur_rss = baseline["results"].get("_process", {}).get("peak_rss_mb"), results["_process"]["peak_rss_mb"]
+    if base_rss and cur_rss > base_rss * (1 + tolerance):
+        problems.append(f"process: peak_rss_mb {cur_rss} > baseline {base_rss} (+{(cur_rss / base_rss - 1) * 100:.0f}%)")
+    for name, base in baseline["results"].items():
+        cur = results.get(name)
+        if name.startswith("_") or cur is None:
+            continue
+        if cur["errors"]:
+            problems.append(f"{name}: {cur['errors']} failed requests (first: {cur['first_error']})")
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if base.get(key) and cur[key] > base[key] * (1 + tolerance):
+                problems.append(f"{name}: {key} {cur[key]} > baseline {base[key]} (+{(cur[key] / base[key] - 1) * 100:.0f}%)")
+        if base.get("rps") and cur["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"{name}: rps {cur['rps']} < baseline {base['rps']} ({(cur['rps'] / base['rps'] - 1) * 100:.0f}%)")
+    return problems
+
+def print_table(results: dict, baseline: dict | None):
+    cols = ("p50_ms", "p95_ms", "p99_ms", "rps", "errors")
+    print(f"\n{'scenario':<20}" + "".join(f"{c:>14}" for c in cols))
+    for name, row in results.items():
+        if name.startswith("_"):
+            continue
+        print(f"{name:<20}" + "".join(f"{row[c]:>14}" for c in cols))
+        base = (baseline or {}).get("results", {}).get(name)
+        if base:
+            print(f"{'  baseline':<20}" + "".join(f"{base.get(c, '-'):>14}" for c in cols))
+    base_rss = (baseline or {}).get("results", {}).get("_process", {}).get("peak_rss_mb")
+    print(f"\npeak RSS: {results['_process']['peak_rss_mb']} MB" + (f" (baseline {base_rss} MB)" if base_rss else "")
+          + f", worker processes: {results['_process']['children_peak_rss_mb']} MB")
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # Settings are read at import time, so point the app at the benchmark files before importing any of it
+    run_db = os.path.join(args.data_dir, "run.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{run_db}"
+    os.environ["BLOB_DIR"] = os.path.join(args.data_dir, "blobs")
+    os.environ.setdefault("TEMPLATES_AUTO_RELOAD", "0")
+    shutil.rmtree(os.environ["BLOB_DIR"], ignore_errors=True)
+    prepare_database(args, run_db)
+
+    results = asyncio.run(run(args))
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    doc = {"settings": _settings(args), "python": sys.version.split()[0], "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(doc, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(doc, f, indent=2)
+        print(f"\nbaseline written to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"\nno baseline at {args.baseline}; run with --save-baseline to record one")
+        return 1 if any(r.get("errors") for n, r in results.items() if not n.startswith("_")) else 0
+    if baseline["settings"] != doc["settings"]:
+        print(f"\nsettings differ from the baseline, results are not comparable:\n  baseline {baseline['settings']}\n  current  {doc['settings']}")
+        return 2
+    problems = compare(results, baseline, args.tolerance)
+    if problems:
+        print(f"\n{'!' * 60}\nPERFORMANCE REGRESSION (tolerance {args.tolerance:.0%}):")
+        for p in problems:
+            print(f"  - {p}")
+        print("!" * 60)
+        return 1
+    print(f"\nno regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
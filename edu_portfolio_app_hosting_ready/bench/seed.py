@@ -0,0 +1,100 @@
+import os, json, random, hashlib, argparse
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app import models, search, crud
+from app.database import Base
+from app.notifications import upload_message
+
+BENCH_PASSWORD = "bench"
+BENCH_ROUNDS = 4  # bcrypt minimum; logins are not what we measure
+BATCH = 5000
+
+def student_email(i: int) -> str:
+    return f"student{i}@bench.local"
+
+def teacher_email(i: int) -> str:
+    return f"teacher{i}@bench.local"
+
+def _batches(rows, size: int = BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _report(name: str, rnd: random.Random) -> str:
+    tokens = rnd.randint(200, 3000)
+    return json.dumps({
+        "filename": name, "type": "text", "summary": "Basic pre-check completed.",
+        "stats": {"tokens": tokens, "unique_tokens": tokens // 3, "long_words": rnd.randint(0, 40), "letters_ratio": round(rnd.uniform(0.6, 0.9), 3)},
+        "notes": [], "analyzer": {"name": "text", "version": 2},
+    })
+
+def seed(path: str, students: int = 2000, teachers: int = 20, assignments: int = 200_000,
+         notifications: int = 200_000, rng_seed: int = 1) -> dict:
+    """Create a fresh SQLite file at `path` with benchmark volumes. Rows go in with
+    bulk Core inserts; users are `student<i>@bench.local` / `teacher<i>@bench.local`
+    with password BENCH_PASSWORD. Returns the id ranges the benchmark needs."""
+    from passlib.hash import bcrypt
+
+    if os.path.exists(path):
+        os.remove(path)
+    rnd = random.Random(rng_seed)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    search.install(engine)
+    hashed = bcrypt.using(rounds=BENCH_ROUNDS).hash(BENCH_PASSWORD)
+    now = datetime.utcnow()
+    statuses = [models.AssignmentStatus.submitted, models.AssignmentStatus.reviewed, models.AssignmentStatus.returned]
+
+    with engine.begin() as conn:
+        users = [{"email": teacher_email(i), "hashed_password": hashed, "role": models.RoleEnum.teacher, "created_at": now} for i in range(teachers)]
+        users += [{"email": student_email(i), "hashed_password": hashed, "role": models.RoleEnum.student, "created_at": now} for i in range(students)]
+        for batch in _batches(users):
+            conn.execute(models.User.__table__.insert(), batch)
+        teacher_ids = list(range(1, teachers + 1))
+        student_ids = list(range(teachers + 1, teachers + students + 1))
+
+        def assignment_rows():
+            for i in range(assignments):
+                sha = hashlib.sha256(str(i).encode()).hexdigest()
+                name = f"essay_{i}.txt"
+                uploaded = now - timedelta(seconds=rnd.randint(0, 365 * 24 * 3600))
+                status = rnd.choices(statuses, weights=(5, 3, 2))[0]
+                yield {
+                    "student_id": rnd.choice(student_ids), "filename": f"{sha}.txt", "original_name": name,
+                    "content_hash": sha, "size": rnd.randint(1_000, 50_000), "uploaded_at": uploaded, "updated_at": uploaded,
+                    "ai_report": _report(name, rnd), "status": status, "precheck_status": models.PrecheckStatus.done,
+                    "teacher_feedback": "Good structure, check your citations." if status != models.AssignmentStatus.submitted else None,
+                }
+        for batch in _batches(assignment_rows()):
+            conn.execute(models.Assignment.__table__.insert(), batch)
+
+        def notification_rows():
+            for i in range(notifications):
+                yield {
+                    "user_id": rnd.choice(teacher_ids), "message": upload_message(student_email(rnd.randrange(students)), f"essay_{i}.txt"),
+                    "created_at": now - timedelta(seconds=rnd.randint(0, 365 * 24 * 3600)), "is_read": rnd.random() < 0.8,
+                }
+        for batch in _batches(notification_rows()):
+            conn.execute(models.Notification.__table__.insert(), batch)
+    with Session(engine) as db:
+        crud.refresh_student_summaries(db)
+        db.commit()
+    engine.dispose()
+    return {"teacher_ids": teacher_ids, "student_ids": student_ids}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a SQLite database with benchmark volumes")
+    parser.add_argument("path")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--teachers", type=int, default=20)
+    parser.add_argument("--assignments", type=int, default=200_000)
+    parser.add_argument("--notifications", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    seed(args.path, args.students, args.teachers, args.assignments, args.notifications, args.seed)
@@ -0,0 +1,71 @@
+import re
+import os
+import sys
+import subprocess
+import tracemalloc
+import pytest
+from app import ai_precheck
+from app.ai_precheck import analyze_file
+
+def reference_stats(text: str) -> dict:
+    """The original whole-file implementation the streaming analyzer replaced."""
+    tokens = re.findall(r"[A-Za-z']+", text)
+    return {
+        "tokens": len(tokens),
+        "unique_tokens": len(set(tokens)),
+        "long_words": len([t for t in tokens if len(t) >= 12]),
+        "letters_ratio": round(sum(ch.isalpha() for ch in text) / max(1, len(text)), 3),
+    }
+
+SAMPLES = [
+    "",
+    "hello",
+    "Hello world, it's a photosynthesis-driven extraordinarily interesting essay.\n" * 40,
+    "internationalization " * 30 + "x",
+    "a" * 100 + " " + "b" * 5 + "," + "a" * 100,
+    "Numbers 123 and symbols #$% mixed with wörds and café'' quotes'",
+    "x² ½ ① abc" * 3,  # numeric characters that are neither letters nor decimal digits
+    " ".join(f"word{i % 97}suffix" for i in range(2000)),
+]
+
+@pytest.mark.parametrize("chunk_chars", [3, 7, 13, 64 * 1024])
+@pytest.mark.parametrize("text", SAMPLES)
+def test_matches_original_implementation(tmp_path, monkeypatch, text, chunk_chars):
+    monkeypatch.setattr(ai_precheck, "CHUNK_CHARS", chunk_chars)  # force tokens across chunk boundaries
+    path = tmp_path / "essay.txt"
+    path.write_text(text, encoding="utf-8")
+    stats = analyze_file(str(path))["stats"]
+    expected = reference_stats(text)
+    assert stats["tokens"] == expected["tokens"]
+    assert stats["long_words"] == expected["long_words"]
+    assert stats["letters_ratio"] == expected["letters_ratio"]
+    assert abs(stats["unique_tokens"] - expected["unique_tokens"]) <= max(1, 0.03 * expected["unique_tokens"])  # HyperLogLog estimate
+
+def test_input_without_separators_stays_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai_precheck, "CHUNK_CHARS", 4096)
+    path = tmp_path / "blob.txt"
+    path.write_text("a" * (4 * 1024 * 1024))
+    tracemalloc.start()
+    try:
+        stats = analyze_file(str(path))["stats"]
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert stats == {"tokens": 1, "unique_tokens": 1, "long_words": 1, "letters_ratio": 1.0}
+    assert peak < 256 * 1024  # a few chunks, not the 4 MB token
+
+def test_long_token_counts_once_whether_or_not_it_spans_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai_precheck, "CHUNK_CHARS", 10)
+    path = tmp_path / "repeat.txt"
+    path.write_text(" ".join(["supercalifragilistic"] * 50))  # lands at varying chunk offsets
+    assert analyze_file(str(path))["stats"]["unique_tokens"] == 1
+
+def test_unique_tokens_do_not_depend_on_the_process_hash_seed(tmp_path):
+    # reports are memoized and shared between workers, so the estimate must be reproducible
+    path = tmp_path / "essay.txt"
+    path.write_text(" ".join("".join(chr(97 + int(d)) for d in str(i)) for i in range(5000)))  # 5000 distinct words
+    code = "import sys; from app.ai_precheck import analyze_file; print(analyze_file(sys.argv[1])['stats']['unique_tokens'])"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    counts = {subprocess.run([sys.executable, "-c", code, str(path)], cwd=root, capture_output=True, text=True, check=True,
+                             env=os.environ | {"PYTHONHASHSEED": seed}).stdout for seed in ("1", "2", "3")}
+    assert len(counts) == 1
@@ -0,0 +1,97 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import sessionmaker
+from app import crud, models
+
+def _cache_total(db) -> int:
+    return db.get(models.PrecheckCacheSize, 1).total_bytes
+
+def _sum_sizes(db) -> int:
+    return sum(size for (size,) in db.query(models.PrecheckResult.size))
+
+def test_precheck_cache_total_tracks_stores_replacements_and_deletes(db):
+    crud.ensure_precheck_cache_size(db)
+    crud.store_precheck_result(db, "a" * 64, "text", 1, "x" * 100, "y" * 50, max_bytes=10_000)
+    crud.store_precheck_result(db, "b" * 64, "text", 1, "x" * 200, None, max_bytes=10_000)
+    crud.store_precheck_result(db, "a" * 64, "text", 2, "x" * 10, None, max_bytes=10_000)  # replaced
+    assert _cache_total(db) == _sum_sizes(db) == 210
+    crud.delete_precheck_result(db, "b" * 64, "text")
+    crud.delete_precheck_result(db, "c" * 64, "text")  # unknown: no-op
+    db.commit()
+    assert _cache_total(db) == _sum_sizes(db) == 10
+
+def test_precheck_cache_evicts_least_recently_used(db):
+    crud.ensure_precheck_cache_size(db)
+    for ch in "abcd":
+        crud.store_precheck_result(db, ch * 64, "text", 1, "x" * 100, None, max_bytes=250)
+    assert {h[0] for (h,) in db.query(models.PrecheckResult.content_hash)} == {"c", "d"}
+    assert _cache_total(db) == _sum_sizes(db) == 200
+
+def test_ensure_precheck_cache_size_seeds_from_existing_rows(db):
+    db.add(models.PrecheckResult(content_hash="a" * 64, analyzer="text", analyzer_version=1, report="{}", size=123))
+    db.commit()
+    crud.ensure_precheck_cache_size(db)
+    crud.ensure_precheck_cache_size(db)  # idempotent
+    assert _cache_total(db) == 123
+
+def _student(db, email: str) -> int:
+    user = models.User(email=email, hashed_password="x", role=models.RoleEnum.student)
+    db.add(user)
+    db.commit()
+    return user.id
+
+def _summaries(db) -> dict:
+    db.expire_all()
+    rows = db.query(models.StudentSummary).all()
+    return {s.student_id: {k: round(getattr(s, k), 6) for k in crud.SUMMARY_COUNTERS} | {"last_upload_at": s.last_upload_at} for s in rows}
+
+def _report(tokens: int) -> str:
+    return json.dumps({"stats": {"tokens": tokens, "long_words": tokens // 10, "letters_ratio": 0.8}})
+
+def test_incremental_summaries_match_a_full_refresh(db):
+    s1, s2 = _student(db, "s1@x"), _student(db, "s2@x")
+    single = [crud.create_assignment(db, sid, f"{i}.txt", f"essay{i}.txt", precheck_path=f"/tmp/{i}") for i, sid in enumerate([s1, s1, s2])]
+    batch = crud.create_assignments(db, s2, [{"stored_filename": f"b{i}.txt", "original_name": f"b{i}.txt", "precheck_path": f"/tmp/b{i}"}
+                                             for i in range(3)])
+    ids = [a.id for a in single + batch]
+
+    jobs = crud.claim_precheck_jobs(db, 10)
+    assert len(jobs) == 6
+    crud.finish_precheck_job(db, jobs[0].id, report_json=_report(100))
+    crud.finish_precheck_job(db, jobs[0].id, report_json=_report(100))  # already done: no-op
+    crud.finish_precheck_job(db, jobs[1].id, report_json="{}")  # no text stats
+    crud.finish_precheck_job(db, jobs[2].id, error="boom", max_attempts=1)  # failed for good
+    crud.finish_precheck_job(db, jobs[3].id, error="boom", max_attempts=3)  # requeued
+    crud.finish_precheck_job(db, jobs[4].id, report_json=_report(50))
+
+    crud.save_feedback(db, ids[0], "good", models.AssignmentStatus.reviewed)
+    crud.save_feedback(db, ids[0], "still good", models.AssignmentStatus.reviewed)  # no status move
+    crud.save_feedback(db, ids[3], "redo", models.AssignmentStatus.returned)
+    assert crud.save_feedback(db, 10_000, "nobody", models.AssignmentStatus.reviewed) is None
+    crud.save_feedback_batch(db, [(ids[1], "ok"), (ids[4], None), (10_000, "missing")], models.AssignmentStatus.reviewed)
+
+    incremental = _summaries(db)
+    crud.refresh_student_summaries(db)
+    db.commit()
+    assert incremental == _summaries(db)
+    assert incremental[s1]["reviewed"] == 2 and incremental[s2]["returned"] == 1 and incremental[s2]["precheck_failed"] == 1
+
+def test_concurrent_feedback_moves_the_status_once(db):
+    student = _student(db, "s@x")
+    aid = crud.create_assignment(db, student, "a.txt", "a.txt").id
+    Session = sessionmaker(bind=db.get_bind(), autoflush=False)
+    statuses = [models.AssignmentStatus.reviewed, models.AssignmentStatus.returned] * 4
+    barrier = threading.Barrier(len(statuses))
+
+    def save(status):
+        with Session() as session:
+            barrier.wait()
+            crud.save_feedback(session, aid, status.value, status)
+
+    with ThreadPoolExecutor(len(statuses)) as pool:
+        list(pool.map(save, statuses))
+    incremental = _summaries(db)
+    crud.refresh_student_summaries(db)
+    db.commit()
+    assert incremental == _summaries(db)
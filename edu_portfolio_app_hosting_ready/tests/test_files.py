@@ -0,0 +1,46 @@
+import pytest
+from fastapi import HTTPException
+from app.files import _etag_matches, _parse_range
+
+@pytest.mark.parametrize("header, size, expected", [
+    ("bytes=0-99", 1000, (0, 99)),
+    ("bytes=500-", 1000, (500, 999)),
+    ("bytes=900-5000", 1000, (900, 999)),  # end clamped to the file
+    ("bytes=-100", 1000, (900, 999)),
+    ("bytes=-5000", 1000, (0, 999)),  # suffix longer than the file
+    ("bytes=0-0", 1, (0, 0)),
+    (" bytes=1-2 ", 10, (1, 2)),
+])
+def test_parse_range(header, size, expected):
+    assert _parse_range(header, size) == expected
+
+@pytest.mark.parametrize("header", ["bytes=-", "bytes=0-1,5-6", "items=0-1", "bytes=a-b", ""])
+def test_parse_range_unsupported_forms_serve_whole_file(header):
+    assert _parse_range(header, 1000) is None
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),  # starts past the end
+    ("bytes=5-2", 1000),  # reversed
+    ("bytes=-0", 1000),
+    ("bytes=-5", 0),  # empty file
+    ("bytes=0-", 0),
+])
+def test_parse_range_unsatisfiable(header, size):
+    with pytest.raises(HTTPException) as exc:
+        _parse_range(header, size)
+    assert exc.value.status_code == 416
+    assert exc.value.headers["Content-Range"] == f"bytes */{size}"
+
+@pytest.mark.parametrize("header, etag, expected", [
+    ('"abc"', '"abc"', True),
+    ('"x", "abc"', '"abc"', True),
+    ('W/"abc"', '"abc"', True),  # weak comparison
+    ('"abc"', 'W/"abc"', True),
+    ("*", '"abc"', True),
+    (" * ", '"abc"', True),
+    ('"abd"', '"abc"', False),
+    ('abc', '"abc"', False),  # unquoted tags are not the same entity tag
+    ("", '"abc"', False),
+])
+def test_etag_matches(header, etag, expected):
+    assert _etag_matches(header, etag) is expected
@@ -0,0 +1,37 @@
+import time
+from sqlalchemy import create_engine, text
+from fastapi import FastAPI, BackgroundTasks
+from fastapi.testclient import TestClient
+from app import metrics
+
+engine = create_engine("sqlite://")
+metrics.instrument_engine(engine)
+
+def _query():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+def _slow_background():
+    _query()
+    _query()
+    time.sleep(0.3)
+
+app = FastAPI()
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.post("/bg-upload")
+def upload(background_tasks: BackgroundTasks):
+    _query()
+    background_tasks.add_task(_slow_background)
+    return "ok"
+
+def _series(histogram, *labels):
+    return histogram._series[labels]
+
+def test_background_tasks_are_not_charged_to_the_request():
+    with TestClient(app) as client:
+        assert client.post("/bg-upload").json() == "ok"
+    latency = _series(metrics.http_requests, "POST", "/bg-upload", 200)
+    queries = _series(metrics.http_request_queries, "/bg-upload")
+    assert latency.count == 1 and latency.sum < 0.3
+    assert queries.count == 1 and queries.sum == 1
@@ -0,0 +1,14 @@
+import asyncio
+from app.pubsub import Broker
+
+def test_publish_reaches_subscribers_of_the_given_users():
+    broker = Broker()
+
+    async def main():
+        async with broker.subscribe(1) as q1, broker.subscribe(2) as q2:
+            await asyncio.to_thread(broker.publish, [1], {"message": "hi"})
+            assert await asyncio.wait_for(q1.get(), 1) == {"message": "hi"}
+            assert q2.empty()
+        assert broker.subscriber_count() == 0
+
+    asyncio.run(main())
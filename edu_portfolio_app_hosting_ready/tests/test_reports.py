@@ -0,0 +1,11 @@
+import pytest
+from app.reports import zip_entry_name
+
+def test_zip_entry_name_keeps_readable_emails():
+    assert zip_entry_name(7, "ana.lee@school.org") == "report_7_ana.lee_at_school.org.pdf"
+
+@pytest.mark.parametrize("email", ["../../.bashrc", "/etc/passwd", "a\\..\\b@x", "ü/ñ@x", "x\x00y"])
+def test_zip_entry_name_cannot_escape_the_archive(email):
+    name = zip_entry_name(3, email)
+    assert name.startswith("report_3_") and name.endswith(".pdf")
+    assert "/" not in name and "\\" not in name and name.isascii() and name.isprintable()
@@ -0,0 +1,49 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from app.storage import UploadLimitMiddleware
+
+LIMIT = 64 * 1024
+
+app = FastAPI()
+app.add_middleware(UploadLimitMiddleware, limits={"/upload": LIMIT})
+handled = []
+
+@app.post("/upload")
+async def upload(file: UploadFile = File(...)):
+    handled.append(file.filename)
+    return {"size": len(await file.read())}
+
+@app.post("/other")
+async def other(file: UploadFile = File(...)):
+    return {"size": len(await file.read())}
+
+client = TestClient(app)
+
+def _multipart(size: int) -> tuple[bytes, str]:
+    boundary = "test-boundary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.txt\"\r\n"
+            f"Content-Type: text/plain\r\n\r\n").encode() + b"x" * size + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+def _chunks(data: bytes, size: int = 8192):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+def test_body_within_limit_is_accepted():
+    r = client.post("/upload", files={"file": ("a.txt", b"x" * 1000, "text/plain")})
+    assert r.status_code == 200 and r.json() == {"size": 1000}
+
+def test_content_length_over_limit_is_refused_unread():
+    handled.clear()
+    r = client.post("/upload", files={"file": ("a.txt", b"x" * (LIMIT + 1), "text/plain")})
+    assert r.status_code == 413 and not handled
+
+def test_streamed_body_over_limit_is_cut_off():
+    handled.clear()
+    body, content_type = _multipart(4 * LIMIT)
+    r = client.post("/upload", content=_chunks(body), headers={"Content-Type": content_type})  # chunked, no Content-Length
+    assert r.status_code == 413 and not handled
+
+def test_other_paths_are_not_limited():
+    r = client.post("/other", files={"file": ("a.txt", b"x" * (2 * LIMIT), "text/plain")})
+    assert r.status_code == 200